@@ -18,6 +18,8 @@ GRAY = (128, 128, 128)
 LIGHT_GRAY = (200, 200, 200)
 BLUE = (0, 0, 255)
 RED = (255, 0, 0)
+FPS = 60  # フレームレートの上限
+IDLE_POLL_MS = 50  # 何も起きていないときにイベントを確かめる間隔 (ミリ秒)
 
 # ゲームモード
 MODE_MENU = 0
@@ -37,10 +39,12 @@ current_player = 1  # 1: 黒, 2: 白
 player_color = 1    # プレイヤーの色 (コンピュータ対戦時)
 board = None
 game_over_message = ""
+computer_move_at = None  # コンピュータが手を打つ時刻 (time.time() の値, 予定がなければ None)
 
 # 画面設定
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Othello")
+clock = pygame.time.Clock()
 
 # フォント
 font_large = pygame.font.SysFont(None, 60)
@@ -287,7 +291,7 @@ def count_stones():
 
 def switch_player():
     """プレイヤーを交代する"""
-    global current_player, game_mode
+    global current_player, game_mode, computer_move_at
     current_player = 3 - current_player
     
     # 次のプレイヤーが置ける場所がない場合はスキップ
@@ -302,10 +306,8 @@ def switch_player():
     
     # コンピュータの手番
     if game_mode == MODE_PVC and current_player != player_color:
-        # 少し待ってからコンピュータの手を決定
-        pygame.display.flip()
-        time.sleep(0.5)
-        computer_move()
+        # 0.5秒後にメインループから打つ (待っている間も描画とイベント処理を続ける)
+        computer_move_at = time.time() + 0.5
 
 def end_game():
     """ゲーム終了処理"""
@@ -412,9 +414,10 @@ def computer_move():
 
 def handle_menu_click(pos):
     """メニュー画面でのクリックを処理する"""
-    global game_mode, difficulty, player_color
+    global game_mode, difficulty, player_color, computer_move_at
     
     x, y = pos
+    computer_move_at = None
     
     # Player vs Player ボタン
     if WIDTH // 2 - 150 <= x <= WIDTH // 2 + 150 and 200 <= y <= 250:
@@ -498,12 +501,13 @@ def handle_game_over_click(pos):
 
 def main():
     """メインゲームループ"""
-    global game_mode
+    global game_mode, computer_move_at
     
     init_board()
+    events = []
     
     while True:
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -518,6 +522,12 @@ def main():
                 elif game_mode == MODE_GAME_OVER:
                     handle_game_over_click(pos)
         
+        # 予定の時刻になったらコンピュータの手を打つ
+        if computer_move_at is not None and time.time() >= computer_move_at:
+            computer_move_at = None
+            if game_mode == MODE_PVC:
+                computer_move()
+        
         # 描画
         if game_mode == MODE_MENU:
             draw_menu()
@@ -528,6 +538,16 @@ def main():
             draw_game_over()
         
         pygame.display.flip()
+        clock.tick(FPS)
+        
+        # 次に何か起きるまで眠る (コンピュータの手の予定があればその時刻まで)
+        events = pygame.event.get()
+        while not events and (computer_move_at is None or time.time() < computer_move_at):
+            if computer_move_at is None:
+                pygame.time.wait(IDLE_POLL_MS)
+            else:
+                pygame.time.wait(max(1, min(IDLE_POLL_MS, int((computer_move_at - time.time()) * 1000))))
+            events = pygame.event.get()
 
 if __name__ == "__main__":
     main()
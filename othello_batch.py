@@ -0,0 +1,278 @@
+"""多数の局面の合法手・裏返る石の数・評価値をまとめて計算する (NumPy, pygame非依存)
+
+分析や学習で数十万局面を調べるときに、OthelloGame を1局面ずつ作って
+get_valid_moves や count_flips を呼ぶのでは遅すぎる。ここでは局面を配列にまとめ、
+マスごと・局面ごとのループを NumPy の配列演算で行う。
+
+局面は (N, 2) の uint64 配列 [手番側, 相手側] で表す (ビット番号は row * 8 + col)。
+board[row][col] 形式の (N, 8, 8) 配列は to_bitboards で変換できる。
+
+python othello_batch.py [局面数] で、無作為な局面について OthelloGame と結果が一致するかを
+確かめ、1局面ずつ計算した場合との速さを比べる。
+"""
+import numpy as np
+
+from othello_bitboard import BOARD_SIZE, FULL_MASK, INNER_COLS_MASK
+from othello_eval import EVAL_BOARD
+
+SQUARES = BOARD_SIZE * BOARD_SIZE
+
+# 評価ボードの重み (マス番号順)
+SQUARE_WEIGHTS = np.array(EVAL_BOARD, dtype=np.int32).reshape(SQUARES)
+
+# 8方向 (行の増分, 列の増分)
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+_INNER = np.uint64(INNER_COLS_MASK)
+_SHIFTS = tuple(np.uint64(shift) for shift in (1, 8, 7, 9))
+
+
+def to_bitboards(boards, players=1):
+    """局面を (N, 2) の uint64 配列 [手番側, 相手側] にする
+
+    boards は (N, 2) のビットボード (そのまま返す) か、board[row][col] 形式
+    (0: 空, 1: 黒, 2: 白) の (N, 8, 8) 配列。後者の場合は players (1: 黒, 2: 白。
+    スカラーか長さ N の配列) を手番として使う。
+    """
+    boards = np.asarray(boards)
+    if boards.ndim == 2 and boards.shape[1] == 2:
+        return boards.astype(np.uint64, copy=False)
+    if boards.ndim != 3 or boards.shape[1:] != (BOARD_SIZE, BOARD_SIZE):
+        raise ValueError(f"局面の配列の形が不正です: {boards.shape}")
+
+    cells = boards.reshape(len(boards), SQUARES)
+    players = np.broadcast_to(np.asarray(players), (len(boards),))[:, None]
+    opponents = 3 - players
+    return np.stack([_pack(cells == players), _pack(cells == opponents)], axis=1)
+
+
+def from_games(games):
+    """OthelloGame のリストを (N, 2) の uint64 配列 [手番側, 相手側] にする"""
+    return np.array([game.get_bitboards() for game in games], dtype=np.uint64).reshape(-1, 2)
+
+
+def _pack(bits):
+    # (N, 64) の bool 配列 -> (N,) の uint64 (マス番号 = ビット番号)
+    packed = np.packbits(bits, axis=1, bitorder="little")
+    return packed.view("<u8").reshape(len(bits)).astype(np.uint64)
+
+
+def _unpack(masks):
+    # (...) の uint64 -> (..., 64) の bool 配列
+    masks = np.ascontiguousarray(masks, dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8).reshape(-1), bitorder="little")
+    return bits.reshape(masks.shape + (SQUARES,)).view(bool)
+
+
+def legal_moves(boards):
+    """手番側の合法手のマスク ((N,) の uint64) を返す
+
+    othello_bitboard.get_moves と同じシフト演算を局面の配列に対して行う。
+    """
+    boards = to_bitboards(boards)
+    player = boards[:, 0]
+    opponent = boards[:, 1]
+    empty = ~(player | opponent)
+    inner = opponent & _INNER
+    moves = np.zeros(len(boards), dtype=np.uint64)
+
+    for shift, mask in zip(_SHIFTS, (inner, opponent, inner, inner)):
+        double = shift + shift
+
+        pair = mask & (mask << shift)
+        t = mask & (player << shift)
+        t |= mask & (t << shift)
+        t |= pair & (t << double)
+        t |= pair & (t << double)
+        moves |= t << shift
+
+        pair = mask & (mask >> shift)
+        t = mask & (player >> shift)
+        t |= mask & (t >> shift)
+        t |= pair & (t >> double)
+        t |= pair & (t >> double)
+        moves |= t >> shift
+
+    return moves & empty
+
+
+def _build_steps():
+    # 各方向について「1マス先の値を各マスに持ってくる」シフト (右シフトか, シフト量, 行をまたいだマスを消すマスク)
+    left_col = 0x0101010101010101
+    right_col = left_col << (BOARD_SIZE - 1)
+    steps = []
+    for dr, dc in DIRECTIONS:
+        delta = dr * BOARD_SIZE + dc
+        mask = FULL_MASK
+        if dc == 1:
+            mask &= ~right_col
+        elif dc == -1:
+            mask &= ~left_col
+        steps.append((delta > 0, np.uint64(abs(delta)), np.uint64(mask)))
+    return tuple(steps)
+
+
+_STEPS = _build_steps()
+
+
+def neighbours(masks):
+    """各マスクのどれかのマスと8方向で隣り合うマスのマスク ((N,) の uint64) を返す (othello_bitboard.neighbours と同じ)"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    result = np.zeros_like(masks)
+    for right, shift, mask in _STEPS:
+        # 1マス先に石があるマスは、その石と隣り合う
+        result |= ((masks >> shift) if right else (masks << shift)) & mask
+    return result
+
+
+def _add_planes(total, planes):
+    # ビットごとに切り出した数 (planes[i] が 2**i の位) を total に足す (全加算器)
+    result = []
+    carry = None
+    for index in range(max(len(total), len(planes))):
+        terms = [plane for plane in (total[index] if index < len(total) else None,
+                                     planes[index] if index < len(planes) else None,
+                                     carry) if plane is not None]
+        if len(terms) == 1:
+            result.append(terms[0])
+            carry = None
+        elif len(terms) == 2:
+            a, b = terms
+            result.append(a ^ b)
+            carry = a & b
+        else:
+            a, b, c = terms
+            half = a ^ b
+            result.append(half ^ c)
+            carry = (a & b) | (c & half)
+    if carry is not None:
+        result.append(carry)
+    return result
+
+
+def flip_counts(boards):
+    """各マスに打ったときに裏返る石の数を (N, 64) の uint8 配列で返す (合法手でないマスは0)
+
+    方向ごとに「distance - 1 個の相手の石の先に自分の石がある」マスのマスクを作り、
+    裏返る数をビットごとのマスク (1, 2, 4 の位) として8方向分足し合わせてから、
+    最後に1回だけマスごとの数に展開する。
+    """
+    boards = to_bitboards(boards)
+    player = boards[:, 0]
+    opponent = boards[:, 1]
+    total = []
+
+    for right, shift, mask in _STEPS:
+        if right:
+            def step(x):
+                return (x >> shift) & mask
+        else:
+            def step(x):
+                return (x << shift) & mask
+
+        # run: そのマスから distance - 1 マス先まで相手の石が続いているか
+        ahead_player = step(player)
+        ahead_opponent = step(opponent)
+        run = ahead_opponent
+        planes = [np.zeros_like(player) for _ in range(3)]
+        for distance in range(2, BOARD_SIZE):
+            ahead_player = step(ahead_player)
+            ahead_opponent = step(ahead_opponent)
+            # 相手の石の連なりの先に自分の石があれば、連なりの長さだけ裏返る
+            # (1つの方向では連なりの長さは1通りなので、位ごとに OR するだけでよい)
+            closed = run & ahead_player
+            for bit in range(3):
+                if (distance - 1) >> bit & 1:
+                    planes[bit] |= closed
+            run &= ahead_opponent
+        total = _add_planes(total, planes)
+
+    empty = ~(player | opponent)
+    bits = _unpack(np.stack(total, axis=1) & empty[:, None])
+    counts = bits[:, 0].astype(np.uint8)
+    for bit in range(1, len(total)):
+        counts += bits[:, bit].astype(np.uint8) << np.uint8(bit)
+    return counts
+
+
+def evaluate(boards):
+    """手番側から見た評価ボードによる評価値 ((N,) の int32) を返す (othello_eval.evaluate と同じ値)"""
+    boards = to_bitboards(boards)
+    diff = _unpack(boards[:, 0]).astype(np.int32) - _unpack(boards[:, 1]).astype(np.int32)
+    return diff @ SQUARE_WEIGHTS
+
+
+def analyze(boards):
+    """合法手のマスク・各マスの裏返る石の数・評価値をまとめて返す"""
+    boards = to_bitboards(boards)
+    return legal_moves(boards), flip_counts(boards), evaluate(boards)
+
+
+def random_games(count, seed=0):
+    """無作為に数手から終局近くまで打ち進めた OthelloGame のリストを返す (検証用)"""
+    import random
+
+    from othello_core import OthelloGame
+
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = OthelloGame()
+        for _ in range(rng.randrange(0, 60)):
+            if game.game_over:
+                break
+            game.make_move(*rng.choice(game.valid_moves))
+        games.append(game)
+    return games
+
+
+def verify(games):
+    """games について OthelloGame の is_valid_move / count_flips / 評価関数と結果を比べ、
+    一致しない局面の数を返す"""
+    from othello_eval import evaluate as evaluate_game
+
+    moves, counts, scores = analyze(from_games(games))
+    mismatches = 0
+    for index, game in enumerate(games):
+        ok = int(scores[index]) == evaluate_game(game)
+        for square in range(SQUARES):
+            row, col = divmod(square, BOARD_SIZE)
+            valid = game.is_valid_move(row, col)
+            ok = ok and valid == bool(int(moves[index]) >> square & 1)
+            ok = ok and counts[index, square] == (game.count_flips(row, col) if valid else 0)
+        if not ok:
+            mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from othello_eval import evaluate as evaluate_game
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    games = random_games(count)
+    boards = from_games(games)
+
+    mismatches = verify(games)
+    print(f"{count} positions, {mismatches} mismatches")
+
+    start = time.perf_counter()
+    analyze(boards)
+    batch_seconds = time.perf_counter() - start
+
+    # キャッシュの効いていない局面で比べる
+    games = random_games(count)
+    start = time.perf_counter()
+    for game in games:
+        game.get_valid_moves()
+        for row, col in game.valid_moves:
+            game.count_flips(row, col)
+        evaluate_game(game)
+    single_seconds = time.perf_counter() - start
+
+    print(f"{'':<12}{'seconds':>10}{'positions/s':>14}")
+    print(f"{'batch':<12}{batch_seconds:>10.3f}{count / batch_seconds:>14.0f}")
+    print(f"{'one by one':<12}{single_seconds:>10.3f}{count / single_seconds:>14.0f}")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,365 @@
+"""ルールの実装ごとの速さとメモリ確保の比較 (pygameなしで実行できる)
+
+このリポジトリには同じルールの実装が複数ある。
+  core      : othello_core.OthelloGame (ビットボード。othello_game.py と othello_game_menu.py が使う)
+  othello   : old/othello.py (グローバル変数の board[row][col])
+  simple    : old/othello_simple.py (同上, コンピュータ対戦なし)
+  advanced  : old/othello_advanced.py (同上)
+old/ のモジュールは import しただけでウィンドウを開くので、pygame の代わりに
+何もしない偽物のモジュールを入れて読み込む。
+
+同じ局面の集合に対して、実装ごとに次の操作を行って1秒あたりの回数を比べる。
+  moves     : 手番側の合法手の一覧を作る
+  apply     : 合法手を1つ打って元の局面に戻す (実装自身の AI と同じ戻し方)
+  ai-medium : 中級 (最も多く石を取れる手) の手を選ぶ
+  ai-hard   : 上級の手を選ぶ (old/ は1手読み, core は深さ1の探索。評価関数が違うので手は一致しない)
+メモリ確保は tracemalloc で測る (1局面分の操作中に一時的に増えたメモリの最大値, バイト)。
+合法手・打った後の盤面・中級の手は全実装で一致することを確かめてから計測する。
+
+--leaf では、探索の末端1つ分 (打つ・合法手の数による評価・戻す) の時間を比べる。
+  advanced  : old/othello_advanced.py の evaluate_board (上級)。盤面を走査して両者の合法手を数える
+  core      : othello_eval.evaluate_mobility (と mobility_features)。相手の合法手・開放度・潜在的な合法手を
+              末端の局面のビットボードから求める
+評価値は old/othello_advanced.py の evaluate_board と一致することを確かめてから計測する。
+
+python othello_bench.py [--positions N] [--seed S] [--leaf]
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+from othello_bitboard import BOARD_SIZE, from_rows, iter_squares
+from othello_core import OthelloGame
+from othello_eval import evaluate_mobility, mobility_features
+
+OLD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "old")
+OPERATIONS = ("moves", "apply", "ai-medium", "ai-hard")
+
+
+class _Dummy:
+    """どんな属性・呼び出しにも自分自身を返す (pygame の代わり)"""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __iter__(self):
+        return iter(())
+
+
+def _stub_pygame():
+    module = types.ModuleType("pygame")
+    dummy = _Dummy()
+    module.__getattr__ = lambda name: dummy
+    return module
+
+
+def load_old_module(name):
+    """old/<name>.py を偽物の pygame で読み込む (本物の pygame は sys.modules に戻す)"""
+    saved = sys.modules.get("pygame")
+    sys.modules["pygame"] = _stub_pygame()
+    try:
+        spec = importlib.util.spec_from_file_location(f"bench_old_{name}", os.path.join(OLD_DIR, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules["pygame"]
+        else:
+            sys.modules["pygame"] = saved
+    # コンピュータの手やパスのたびに出す print を止める
+    module.print = lambda *args, **kwargs: None
+    return module
+
+
+class CoreAdapter:
+    """othello_core.OthelloGame"""
+
+    name = "core"
+    has_ai = True
+
+    def __init__(self):
+        self.game = OthelloGame()
+        self.game.use_book = False
+        # old/ の上級と同じ評価ボードで比べる (パターンの評価は othello_pattern.py bench で比べる)
+        self.game.evaluation = "squares"
+
+    def load(self, black, white, player):
+        self.game.set_position(black, white, player)
+
+    def moves(self):
+        return self.game.get_valid_moves()
+
+    def apply(self, move):
+        self.game.push(move)
+        self.game.pop()
+
+    def board_after(self, move):
+        game = self.game
+        game.push(move)
+        result = (game.black, game.white)
+        game.pop()
+        return result
+
+    def ai(self, hard):
+        game = self.game
+        game.difficulty = 3 if hard else 2
+        game.search_depth = 1
+        game.search_time = None
+        game.endgame_empties = 0
+        return game.get_computer_move()
+
+
+class OldAdapter:
+    """old/ のグローバル変数版"""
+
+    def __init__(self, name):
+        self.name = name.replace("othello_", "")
+        self.module = load_old_module(name)
+        self.has_ai = hasattr(self.module, "computer_move")
+
+    def load(self, black, white, player):
+        module = self.module
+        module.board = [[1 if black >> (row * BOARD_SIZE + col) & 1 else
+                         2 if white >> (row * BOARD_SIZE + col) & 1 else 0
+                         for col in range(BOARD_SIZE)] for row in range(BOARD_SIZE)]
+        module.current_player = player
+
+    def moves(self):
+        return self.module.get_valid_moves(self.module.current_player)
+
+    def apply(self, move):
+        # computer_move の上級と同じく、盤面を写して打ち、写しから書き戻す
+        module = self.module
+        board = module.board
+        temp_board = [row[:] for row in board]
+        module.make_move(move[0], move[1], module.current_player)
+        for i in range(BOARD_SIZE):
+            for j in range(BOARD_SIZE):
+                board[i][j] = temp_board[i][j]
+
+    def board_after(self, move):
+        module = self.module
+        temp_board = [row[:] for row in module.board]
+        module.make_move(move[0], move[1], module.current_player)
+        result = from_rows(module.board)
+        module.board = temp_board
+        return result
+
+    def ai(self, hard):
+        # computer_move は手を打って手番を進めるので、打った手を盤面の差分から求めて元に戻す
+        module = self.module
+        module.difficulty = module.DIFFICULTY_HARD if hard else module.DIFFICULTY_MEDIUM
+        module.game_mode = module.MODE_PVP
+        before = [row[:] for row in module.board]
+        player = module.current_player
+        module.computer_move()
+        move = next((row, col) for row in range(BOARD_SIZE) for col in range(BOARD_SIZE)
+                    if before[row][col] == 0 and module.board[row][col] != 0)
+        module.board = before
+        module.current_player = player
+        return move
+
+
+def make_adapters():
+    return [CoreAdapter()] + [OldAdapter(name) for name in ("othello", "othello_simple", "othello_advanced")]
+
+
+def random_positions(count, seed=0):
+    """無作為に打ち進めた、手番側に合法手がある局面 [(black, white, player)] を返す"""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = OthelloGame()
+        for _ in range(rng.randrange(0, 58)):
+            if game.game_over:
+                break
+            game.make_move(*rng.choice(game.valid_moves))
+        if not game.game_over:
+            positions.append((game.black, game.white, game.current_player))
+    return positions
+
+
+def check_agreement(adapters, positions):
+    """合法手・打った後の盤面・中級の手が全実装で一致するかを調べ、一致しない内容のリストを返す"""
+    errors = []
+    for index, (black, white, player) in enumerate(positions):
+        expected = None
+        for adapter in adapters:
+            adapter.load(black, white, player)
+            moves = sorted(adapter.moves())
+            result = (moves, [adapter.board_after(move) for move in moves],
+                      adapter.ai(False) if adapter.has_ai else None)
+            if expected is None:
+                expected = result
+            elif result[:2] != expected[:2] or (result[2] is not None and result[2] != expected[2]):
+                errors.append(f"position {index}: {adapter.name} differs from {adapters[0].name}")
+    return errors
+
+
+def _operation(adapter, name):
+    # 局面を読み込んだ後に1回行う操作と、その操作の回数を返す関数
+    if name == "moves":
+        return lambda moves: (adapter.moves(), 1)[1]
+    if name == "apply":
+        def apply_all(moves):
+            for move in moves:
+                adapter.apply(move)
+            return len(moves)
+        return apply_all
+    hard = name == "ai-hard"
+    return lambda moves: (adapter.ai(hard), 1)[1]
+
+
+def measure(adapter, name, positions):
+    """(1秒あたりの回数, 1局面分の操作中のメモリ確保の最大値 (バイト)) を返す。対応していなければ None"""
+    if name.startswith("ai") and not adapter.has_ai:
+        return None
+    operation = _operation(adapter, name)
+    prepared = []
+    for black, white, player in positions:
+        adapter.load(black, white, player)
+        prepared.append(sorted(adapter.moves()))
+
+    # 速さ (局面の読み込みは含めない)
+    seconds = 0.0
+    count = 0
+    for (black, white, player), moves in zip(positions, prepared):
+        adapter.load(black, white, player)
+        start = time.perf_counter()
+        count += operation(moves)
+        seconds += time.perf_counter() - start
+
+    # メモリ確保
+    peak = 0
+    tracemalloc.start()
+    for (black, white, player), moves in zip(positions, prepared):
+        adapter.load(black, white, player)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        if operation(moves):
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return count / seconds if seconds else 0.0, peak
+
+
+def run_benchmark(positions, adapters=None):
+    """{実装の名前: {操作: (回/秒, メモリ確保の最大値) または None}} を返す"""
+    adapters = make_adapters() if adapters is None else adapters
+    return {adapter.name: {name: measure(adapter, name, positions) for name in OPERATIONS}
+            for adapter in adapters}
+
+
+def format_table(results):
+    names = list(results)
+    lines = [f"{'':<12}" + "".join(f"{name:>22}" for name in names),
+             f"{'':<12}" + "".join(f"{'ops/s':>12}{'peak B':>10}" for _ in names)]
+    for operation in OPERATIONS:
+        cells = []
+        for name in names:
+            value = results[name][operation]
+            cells.append(f"{'-':>12}{'-':>10}" if value is None else f"{value[0]:>12.0f}{value[1]:>10}")
+        lines.append(f"{operation:<12}" + "".join(cells))
+    return "\n".join(lines)
+
+
+LEAF_METHODS = ("advanced", "core")
+
+
+def _leaf_function(method):
+    # 局面を読み込んで、合法手ごとに末端1つ分の処理を行い [評価値] を返す関数 (評価値は打った側から見た値)
+    if method == "advanced":
+        adapter = OldAdapter("othello_advanced")
+        module = adapter.module
+        module.difficulty = module.DIFFICULTY_HARD
+
+        def leaves(black, white, player, features):
+            adapter.load(black, white, player)
+            board = module.board
+            scores = []
+            for row, col in module.get_valid_moves(player):
+                temp_board = [line[:] for line in board]
+                module.make_move(row, col, player)
+                scores.append(module.evaluate_board(player))
+                for i in range(BOARD_SIZE):
+                    board[i][:] = temp_board[i]
+            return scores
+        return leaves
+
+    game = OthelloGame()
+
+    def leaves(black, white, player, features):
+        game.set_position(black, white, player)
+        scores = []
+        for square in iter_squares(game.moves):
+            game.push_square(square)
+            score = evaluate_mobility(game)
+            if features:
+                mobility_features(game)
+            scores.append(score if game.current_player == player else -score)
+            game.pop()
+        return scores
+    return leaves
+
+
+def leaf_costs(positions, features=False, repeat=5):
+    """{方法: 末端1つあたりのマイクロ秒 (repeat 回測った最小値)} を返す
+    (features なら開放度・潜在的な合法手も読む。advanced は対応しない)
+
+    全ての方法の評価値が一致しなければ ValueError を送出する。
+    """
+    results = {}
+    expected = None
+    for method in LEAF_METHODS:
+        if features and method == "advanced":
+            continue
+        leaves = _leaf_function(method)
+        scores = [leaves(black, white, player, features) for black, white, player in positions]
+        if expected is None:
+            expected = scores
+        elif scores != expected:
+            raise ValueError(f"{method} の評価値が一致しません")
+        count = sum(len(entry) for entry in scores)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for black, white, player in positions:
+                leaves(black, white, player, features)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        results[method] = best / count * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ルールの実装ごとの速さの比較")
+    parser.add_argument("--positions", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--leaf", action="store_true", help="探索の末端1つ分の時間を比べる")
+    args = parser.parse_args()
+
+    positions = random_positions(args.positions, args.seed)
+    if args.leaf:
+        plain = leaf_costs(positions)
+        full = leaf_costs(positions, True)
+        print(f"{len(positions)} positions, all methods agree with old/othello_advanced.py evaluate_board\n")
+        print(f"{'us/leaf':<12}{'mobility':>10}{'+features':>11}")
+        for method in LEAF_METHODS:
+            print(f"{method:<12}{plain[method]:>10.2f}" + (f"{full[method]:>11.2f}" if method in full else f"{'-':>11}"))
+        sys.exit(0)
+    adapters = make_adapters()
+    errors = check_agreement(adapters, positions)
+    for error in errors[:10]:
+        print(error)
+    if errors:
+        sys.exit(1)
+    print(f"{len(positions)} positions, all implementations agree\n")
+    print(format_table(run_benchmark(positions, adapters)))
@@ -0,0 +1,168 @@
+"""ビットボードによる盤面演算
+
+盤面を黒と白それぞれ1つの64ビット整数で表す。
+ビット番号は row * 8 + col (左上が0, 右下が63)。
+pygameには依存しない。
+"""
+
+BOARD_SIZE = 8
+
+# 64ビット全体
+FULL_MASK = 0xFFFFFFFFFFFFFFFF
+# 左端と右端の列を除いたマスク (横・斜め方向のシフトで行をまたがないようにする)
+INNER_COLS_MASK = 0x7E7E7E7E7E7E7E7E
+# 左端の列 (col 0) を除いたマスクと、右端の列 (col 7) を除いたマスク
+NOT_LEFT_MASK = 0xFEFEFEFEFEFEFEFE
+NOT_RIGHT_MASK = 0x7F7F7F7F7F7F7F7F
+
+# 初期配置
+START_BLACK = (1 << 28) | (1 << 35)  # (3, 4), (4, 3)
+START_WHITE = (1 << 27) | (1 << 36)  # (3, 3), (4, 4)
+
+# マス番号 -> (row, col)
+SQUARE_COORDS = [divmod(square, BOARD_SIZE) for square in range(BOARD_SIZE * BOARD_SIZE)]
+
+
+# 立っているビットの数
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python 3.9 以前
+    def popcount(x):
+        return bin(x).count("1")
+
+
+def get_moves(player, opponent):
+    """手番側が石を置けるマスのビットマスクを返す"""
+    empty = ~(player | opponent) & FULL_MASK
+    inner = opponent & INNER_COLS_MASK
+    moves = 0
+
+    # 横(1), 縦(8), 斜め(7, 9) の各方向について、両向きに相手の石の連なりを伸ばす
+    # (2マス飛ばしのシフトを併用して、6回のシフトを4回に減らしている)
+    for shift, mask in ((1, inner), (8, opponent), (7, inner), (9, inner)):
+        double = shift + shift
+
+        pair = mask & (mask << shift)
+        t = mask & (player << shift)
+        t |= mask & (t << shift)
+        t |= pair & (t << double)
+        t |= pair & (t << double)
+        moves |= t << shift
+
+        pair = mask & (mask >> shift)
+        t = mask & (player >> shift)
+        t |= mask & (t >> shift)
+        t |= pair & (t >> double)
+        t |= pair & (t >> double)
+        moves |= t >> shift
+
+    return moves & empty
+
+
+def neighbours(mask):
+    """mask のどれかのマスと8方向で隣り合うマスのビットマスクを返す"""
+    # 左 (col - 1) へ広げるのは左端の列以外、右 (col + 1) へ広げるのは右端の列以外のマスから
+    left = mask & NOT_LEFT_MASK
+    right = mask & NOT_RIGHT_MASK
+    spread = ((mask << 8) | (mask >> 8) | (right << 1) | (left >> 1)
+              | (right << 9) | (left << 7) | (right >> 7) | (left >> 9))
+    return spread & FULL_MASK
+
+
+def _build_rays():
+    # 各マスから8方向に伸びる半直線のうち、2マス以上あるものだけを
+    # (隣のマスのビット, 半直線のマスク, ビット番号が増える向きか) の形で持つ
+    directions = [(0, 1), (1, -1), (1, 0), (1, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)]
+    rays = []
+    for square in range(BOARD_SIZE * BOARD_SIZE):
+        row, col = divmod(square, BOARD_SIZE)
+        entries = []
+        for dr, dc in directions:
+            ray = 0
+            r, c = row + dr, col + dc
+            while 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE:
+                ray |= 1 << (r * BOARD_SIZE + c)
+                r += dr
+                c += dc
+            if ray & (ray - 1):
+                neighbour = 1 << ((row + dr) * BOARD_SIZE + col + dc)
+                entries.append((neighbour, ray, (dr, dc) > (0, 0)))
+        rays.append(tuple(entries))
+    return rays
+
+
+_RAYS = _build_rays()
+
+
+def get_flips(player, opponent, square):
+    """square に石を置いたときに裏返る石のビットマスクを返す"""
+    flips = 0
+    for neighbour, ray, forward in _RAYS[square]:
+        # 隣が相手の石でない方向は裏返らない
+        if not neighbour & opponent:
+            continue
+        # 半直線上で最初に現れる相手以外のマスが自分の石なら、その手前までを裏返す
+        blockers = ray & ~opponent
+        if forward:
+            first = blockers & -blockers
+            if first & player:
+                flips |= ray & (first - 1)
+        elif blockers:
+            first = 1 << (blockers.bit_length() - 1)
+            if first & player:
+                flips |= ray & ~(first + first - 1)
+    return flips
+
+
+def to_coords(mask):
+    """マスクに含まれるマスを (row, col) のリストにする (行優先の走査順)"""
+    coords = []
+    while mask:
+        low = mask & -mask
+        coords.append(SQUARE_COORDS[low.bit_length() - 1])
+        mask ^= low
+    return coords
+
+
+def iter_squares(mask):
+    """マスクに含まれるマス番号を小さい順 (行優先の走査順) に返す"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def from_rows(rows):
+    """board[row][col] 形式 (0: 空, 1: 黒, 2: 白) をビットボードに変換する"""
+    black = 0
+    white = 0
+    for row in range(BOARD_SIZE):
+        for col in range(BOARD_SIZE):
+            if rows[row][col] == 1:
+                black |= 1 << (row * BOARD_SIZE + col)
+            elif rows[row][col] == 2:
+                white |= 1 << (row * BOARD_SIZE + col)
+    return black, white
+
+
+class BoardView:
+    """black/white 属性を持つオブジェクトを board[row][col] 形式で読むためのビュー"""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def __getitem__(self, row):
+        shift = row * BOARD_SIZE
+        black = self._owner.black >> shift
+        white = self._owner.white >> shift
+        return tuple(1 if black >> col & 1 else 2 if white >> col & 1 else 0
+                     for col in range(BOARD_SIZE))
+
+    def __len__(self):
+        return BOARD_SIZE
+
+    def __iter__(self):
+        for row in range(BOARD_SIZE):
+            yield self[row]
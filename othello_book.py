@@ -0,0 +1,266 @@
+"""定石ブック (pygame非依存)
+
+序盤の局面と、その局面での各手の評価値を固定長レコードのバイナリファイルに保存する。
+局面は盤面の8通りの対称変換 (回転・反転) のうち最小のものに正規化してから
+キーにするので、対称な局面は1つのレコード群にまとまる。
+
+ファイルは mmap で開き、ソート済みのレコードを二分探索する。
+起動時にファイル全体を読み込んだり解析したりはしない。
+
+評価値の尺度は探索の評価関数によって違うので、ヘッダにブックを作ったときの評価関数の名前
+(OthelloGame.evaluation と同じ "pattern" / "squares") を入れておき、上級の探索の評価関数と
+違うブックは使わない。
+
+ファイル形式 (リトルエンディアン):
+    ヘッダ: マジック "OTBK", バージョン(u16), レコード長(u16), レコード数(u32), 評価関数の名前(8バイト)
+    レコード: 手番側(u64), 相手側(u64), 手(u8, 正規化後のマス番号), 予備(u8), 評価値(i16)
+    (バージョン1のファイルは評価関数の名前を持たず、評価ボード "squares" で作ったものとして扱う)
+
+python othello_book.py build [出力ファイル] [手数] [深さ] でブックを作成できる。
+"""
+import mmap
+import os
+import random
+import struct
+
+from othello_bitboard import BOARD_SIZE, SQUARE_COORDS, iter_squares
+
+BOOK_MAGIC = b"OTBK"
+BOOK_VERSION = 2
+HEADER = struct.Struct("<4sHHI8s")
+# バージョン1のヘッダ (評価関数の名前なし)
+HEADER_V1 = struct.Struct("<4sHHI")
+RECORD = struct.Struct("<QQBxh")
+
+# 同梱の定石ブック
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+def flip_vertical(x):
+    """上下反転 (行の順番を逆にする)"""
+    return int.from_bytes(x.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(x):
+    """左右反転 (各行の中で列の順番を逆にする)"""
+    x = ((x >> 1) & 0x5555555555555555) | ((x & 0x5555555555555555) << 1)
+    x = ((x >> 2) & 0x3333333333333333) | ((x & 0x3333333333333333) << 2)
+    x = ((x >> 4) & 0x0F0F0F0F0F0F0F0F) | ((x & 0x0F0F0F0F0F0F0F0F) << 4)
+    return x
+
+
+def transpose(x):
+    """左上-右下の対角線で反転 ((row, col) -> (col, row))"""
+    t = 0x0F0F0F0F00000000 & (x ^ (x << 28))
+    x ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (x ^ (x << 14))
+    x ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (x ^ (x << 7))
+    x ^= t ^ (t >> 7)
+    return x
+
+
+def transform(x, symmetry):
+    """8通りの対称変換 (0〜7) の1つを適用する"""
+    if symmetry & 1:
+        x = mirror_horizontal(x)
+    if symmetry & 2:
+        x = flip_vertical(x)
+    if symmetry & 4:
+        x = transpose(x)
+    return x
+
+
+# 対称変換ごとのマス番号の対応 (変換後のマス番号 -> 元のマス番号)
+_INVERSE_SQUARE = []
+for _symmetry in range(8):
+    _inverse = [0] * (BOARD_SIZE * BOARD_SIZE)
+    for _square in range(BOARD_SIZE * BOARD_SIZE):
+        _inverse[transform(1 << _square, _symmetry).bit_length() - 1] = _square
+    _INVERSE_SQUARE.append(_inverse)
+del _symmetry, _inverse, _square
+
+
+def canonical(player, opponent):
+    """(手番側, 相手側) を正規化し、(手番側, 相手側, 使った対称変換) を返す"""
+    best = (player, opponent, 0)
+    for symmetry in range(1, 8):
+        key = (transform(player, symmetry), transform(opponent, symmetry))
+        if key < best[:2]:
+            best = key + (symmetry,)
+    return best
+
+
+def to_canonical_square(square, symmetry):
+    return transform(1 << square, symmetry).bit_length() - 1
+
+
+def from_canonical_square(square, symmetry):
+    return _INVERSE_SQUARE[symmetry][square]
+
+
+class OpeningBook:
+    """mmap で開いた定石ブック"""
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, count = HEADER_V1.unpack_from(self._map, 0)
+        if magic != BOOK_MAGIC or version not in (1, BOOK_VERSION) or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"定石ブックの形式が正しくありません: {path}")
+        if version == 1:
+            self._offset = HEADER_V1.size
+            self.evaluation = "squares"
+        else:
+            self._offset = HEADER.size
+            self.evaluation = HEADER.unpack_from(self._map, 0)[4].rstrip(b"\0").decode("ascii")
+        self.count = count
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, index):
+        return RECORD.unpack_from(self._map, self._offset + index * RECORD.size)
+
+    def lookup(self, game):
+        """game の局面の定石手を [((row, col), 評価値), ...] で返す。なければ空のリスト"""
+        if game.game_over:
+            return []
+        player, opponent = game.get_bitboards()
+        player, opponent, symmetry = canonical(player, opponent)
+        key = (player, opponent)
+
+        # 二分探索で最初のレコードを探す
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle)[:2] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self.count):
+            record_player, record_opponent, move, score = self._key_at(index)
+            if (record_player, record_opponent) != key:
+                break
+            square = from_canonical_square(move, symmetry)
+            if game.moves >> square & 1:
+                entries.append((SQUARE_COORDS[square], score))
+        return entries
+
+    def choose(self, game, margin=0, rng=random):
+        """最善の評価値から margin 以内の定石手を無作為に1つ選ぶ。なければ None"""
+        entries = self.lookup(game)
+        if not entries:
+            return None
+        best = max(score for _, score in entries)
+        return rng.choice([move for move, score in entries if score >= best - margin])
+
+
+_default_book = None
+
+
+def get_default_book():
+    """同梱の定石ブックを開いて返す (プロセス内で1回だけ開く)。ファイルがなければ None"""
+    global _default_book
+    if _default_book is None and os.path.exists(DEFAULT_BOOK_PATH):
+        _default_book = OpeningBook(DEFAULT_BOOK_PATH)
+    return _default_book
+
+
+def write_book(path, records, evaluation="pattern"):
+    """(手番側, 相手側, 正規化後のマス番号, 評価値) のレコードをソートして書き出す"""
+    records = sorted(set(records))
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, RECORD.size, len(records), evaluation.encode("ascii")))
+        for player, opponent, move, score in records:
+            f.write(RECORD.pack(player, opponent, move, max(-32768, min(32767, score))))
+    return len(records)
+
+
+def build_book(path=DEFAULT_BOOK_PATH, plies=5, depth=6, evaluation="pattern"):
+    """初期局面から plies 手目までの局面の全ての手を深さ depth で評価してブックを作る
+
+    evaluation は探索の評価関数 ("pattern": othello_pattern のパターン, "squares": 評価ボード)。
+    上級の探索 (OthelloGame.evaluation) と同じ評価関数で作ったブックだけが使われる
+    """
+    from othello_core import OthelloGame
+    from othello_eval import final_score
+    from othello_search import SearchEngine
+
+    evaluator = None
+    if evaluation == "pattern":
+        from othello_pattern import PatternEvaluator
+        evaluator = PatternEvaluator()
+    elif evaluation != "squares":
+        raise ValueError(f"評価関数の名前が正しくありません: {evaluation}")
+    engine = SearchEngine(max_depth=depth - 1, evaluator=evaluator)
+    records = []
+    seen = set()
+    # 正規化した局面 -> その局面の手番側から見た評価値 (対称な局面で評価値を揃えるため)
+    scores = {}
+
+    def evaluate(game):
+        player, opponent, _ = canonical(*game.get_bitboards())
+        key = (player, opponent)
+        if key not in scores:
+            if game.game_over:
+                scores[key] = final_score(game)
+            else:
+                engine.search(game)
+                scores[key] = engine.best_score
+        return scores[key]
+
+    def visit(game, ply):
+        player, opponent = game.get_bitboards()
+        canonical_player, canonical_opponent, symmetry = canonical(player, opponent)
+        if (canonical_player, canonical_opponent) in seen:
+            return
+        seen.add((canonical_player, canonical_opponent))
+
+        mover = game.current_player
+        for square in list(iter_squares(game.moves)):
+            game.push_square(square)
+            score = evaluate(game)
+            if game.current_player != mover:
+                score = -score
+            records.append((canonical_player, canonical_opponent,
+                            to_canonical_square(square, symmetry), score))
+            if ply < plies and not game.game_over:
+                visit(game, ply + 1)
+            game.pop()
+
+    visit(OthelloGame(), 0)
+    return write_book(path, records, evaluation), len(seen)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("usage: python othello_book.py build [path] [plies] [depth] [pattern|squares]")
+        sys.exit(1)
+    book_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_BOOK_PATH
+    book_plies = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    book_depth = int(sys.argv[4]) if len(sys.argv) > 4 else 6
+    book_evaluation = sys.argv[5] if len(sys.argv) > 5 else "pattern"
+    started = time.perf_counter()
+    record_count, position_count = build_book(book_path, book_plies, book_depth, book_evaluation)
+    print(f"{position_count} positions, {record_count} records -> {book_path} "
+          f"({time.perf_counter() - started:.1f}s)")
@@ -0,0 +1,293 @@
+"""オセロのルールとコンピュータの思考 (pygame非依存)
+
+GUIを持たないワーカーやテストからも import できるように、
+盤面・合法手・着手・コンピュータの手の選択だけをまとめている。
+"""
+import copy
+import random
+import time
+
+from othello_bitboard import (BOARD_SIZE, SQUARE_COORDS, START_BLACK, START_WHITE, BoardView,
+                              get_flips, get_moves, popcount, to_coords)
+from othello_search import SearchEngine
+from othello_tt import (START_KEY, ZOBRIST_BLACK, ZOBRIST_FLIP, ZOBRIST_WHITE, ZOBRIST_WHITE_TO_MOVE,
+                        zobrist_key)
+
+
+class OthelloGame:
+    def __init__(self):
+        # ボード初期化 (黒と白それぞれの64ビット整数, ビット番号 = row * 8 + col)
+        self.black = START_BLACK
+        self.white = START_WHITE
+        # 描画用に board[row][col] (0: 空, 1: 黒, 2: 白) で読めるようにする
+        self.board = BoardView(self)
+        
+        # 黒のターンから開始
+        self.current_player = 1
+        self.game_over = False
+        # 手番側の合法手のマスク (make_move で差分更新する)
+        self.moves = get_moves(self.black, self.white)
+        # 合法手リストと各手の裏返しマスクは必要になったときに作り、局面が変わるまで使い回す
+        self._valid_moves = None
+        self._flips = {}
+        # 局面のZobristキー (push/pop で差分更新する)
+        self.key = START_KEY
+        # push で積んだ差分 (打ったマス, 裏返した石, 打った側, 打つ前の合法手, 打つ前の終了フラグ, 打つ前のキー)
+        self.history = []
+        
+        # ゲームモード (0: 対人, 1: コンピュータ)
+        self.game_mode = 0
+        # 難易度 (1: 初級, 2: 中級, 3: 上級)
+        self.difficulty = 1
+        # 上級の探索の深さと1手あたりの時間 (秒)。None は制限なし
+        self.search_depth = None
+        self.search_time = 0.5
+        # 空きマスがこの数以下になったら終局まで読み切る
+        self.endgame_empties = 12
+        # 上級の探索の評価関数 ("pattern": othello_pattern のパターン, "squares": 評価ボード)。最初の探索の前に設定する
+        self.evaluation = "pattern"
+        # 上級の探索に使うプロセス数 (2以上なら othello_parallel の並列探索。最初の探索の前に設定する)
+        self.search_workers = 1
+        self.engine = None
+        # 上級で定石ブックを使うかどうかと、最善から何点差までの定石手を無作為に選ぶか
+        self.use_book = True
+        self.book_margin = 4
+        # 直前のコンピュータの手の統計と、統計を追記するファイル (None なら書かない)
+        self.last_stats = None
+        self.stats_log = None
+        # 上級の探索で時間の内訳 (手の生成・着手と戻し・評価・置換表) も測るか
+        self.search_profile = False
+        
+    @property
+    def valid_moves(self):
+        if self._valid_moves is None:
+            self._valid_moves = to_coords(self.moves)
+        return self._valid_moves
+    
+    def get_opponent(self):
+        return 2 if self.current_player == 1 else 1
+    
+    # (手番側, 相手側) のビットボード
+    def get_bitboards(self):
+        if self.current_player == 1:
+            return self.black, self.white
+        return self.white, self.black
+    
+    def is_valid_position(self, row, col):
+        return 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE
+    
+    def get_valid_moves(self):
+        player, opponent = self.get_bitboards()
+        return to_coords(get_moves(player, opponent))
+    
+    def is_valid_move(self, row, col):
+        return bool(self.moves >> (row * BOARD_SIZE + col) & 1)
+    
+    # square に打ったときに裏返る石のマスク (合法手のみキャッシュする)
+    def get_flips(self, square):
+        flips = self._flips.get(square)
+        if flips is None:
+            player, opponent = self.get_bitboards()
+            flips = get_flips(player, opponent, square)
+            if self.moves >> square & 1:
+                self._flips[square] = flips
+        return flips
+    
+    def make_move(self, row, col):
+        square = row * BOARD_SIZE + col
+        if not self.moves >> square & 1:
+            return False
+        
+        self.push_square(square)
+        return True
+    
+    # 手を進める (move は (row, col))。盤面はコピーせず、pop で戻すための差分だけを記録する
+    def push(self, move):
+        row, col = move
+        self.push_square(row * BOARD_SIZE + col)
+    
+    def push_square(self, square):
+        if not self.moves >> square & 1:
+            raise ValueError(f"不正な手です: {SQUARE_COORDS[square]}")
+        
+        flips = self.get_flips(square)
+        mover = self.current_player
+        self.history.append((square, flips, mover, self.moves, self.game_over, self.key))
+        
+        player, opponent = self.get_bitboards()
+        player |= flips | (1 << square)
+        opponent ^= flips
+        if mover == 1:
+            self.black, self.white = player, opponent
+        else:
+            self.white, self.black = player, opponent
+        self._valid_moves = None
+        self._flips.clear()
+        
+        # キーの差分更新 (置いた石と裏返した石, 手番)
+        key = self.key ^ (ZOBRIST_BLACK[square] if mover == 1 else ZOBRIST_WHITE[square])
+        while flips:
+            low = flips & -flips
+            key ^= ZOBRIST_FLIP[low.bit_length() - 1]
+            flips ^= low
+        
+        # ターン交代 (変化したのは打ったマスと裏返した石だけなので、合法手はマスク演算1回で求まる)
+        self.current_player = 3 - mover
+        self.moves = get_moves(opponent, player)
+        self.key = key ^ ZOBRIST_WHITE_TO_MOVE
+        
+        # 相手がパスの場合
+        if not self.moves:
+            self.current_player = mover
+            self.key = key
+            self.moves = get_moves(player, opponent)
+            
+            # ゲーム終了判定
+            if not self.moves:
+                self.game_over = True
+    
+    # 最後に push した手を取り消し、その手を (row, col) で返す
+    def pop(self):
+        square, flips, mover, moves, game_over, key = self.history.pop()
+        if mover == 1:
+            self.black ^= flips | (1 << square)
+            self.white ^= flips
+        else:
+            self.white ^= flips | (1 << square)
+            self.black ^= flips
+        self.current_player = mover
+        self.moves = moves
+        self.game_over = game_over
+        self.key = key
+        self._valid_moves = None
+        self._flips.clear()
+        return SQUARE_COORDS[square]
+    
+    # 任意の局面にする (黒・白のビットボードと手番)。手番側が打てなければパスして相手の手番にする
+    def set_position(self, black, white, current_player=1):
+        if black & white:
+            raise ValueError("黒と白の石が重なっています")
+        self.black = black
+        self.white = white
+        self.current_player = current_player
+        self.history = []
+        self._valid_moves = None
+        self._flips.clear()
+        self.game_over = False
+        
+        player, opponent = self.get_bitboards()
+        self.moves = get_moves(player, opponent)
+        if not self.moves:
+            self.current_player = 3 - current_player
+            self.moves = get_moves(opponent, player)
+            if not self.moves:
+                self.current_player = current_player
+                self.game_over = True
+        self.key = zobrist_key(black, white, self.current_player)
+    
+    def count_discs(self):
+        return popcount(self.black), popcount(self.white)
+    
+    def get_winner(self):
+        black_count, white_count = self.count_discs()
+        if black_count > white_count:
+            return "黒の勝ち!"
+        elif white_count > black_count:
+            return "白の勝ち!"
+        else:
+            return "引き分け!"
+    
+    # 探索エンジンを終了する (並列探索ならワーカーのプロセスと共有メモリを解放する)。
+    # copy() した局面とは探索エンジンを共有しているので、それらでもう考えさせなくなってから呼ぶ
+    def close(self):
+        engine, self.engine = self.engine, None
+        if engine is not None and hasattr(engine, "close"):
+            engine.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    # 局面を複製する (別スレッドで考えさせるため。探索エンジンと置換表は共有する)
+    def copy(self):
+        game = copy.copy(self)
+        game.board = BoardView(game)
+        game.history = list(self.history)
+        game._flips = dict(self._flips)
+        return game
+    
+    # コンピュータの手を計算 (stop_event がセットされたら上級の探索を打ち切る)
+    # 手を決めるたびに統計を last_stats (dict) に残し、stats_log (ファイル名) があれば1行のJSONで追記する
+    def get_computer_move(self, stop_event=None):
+        if not self.valid_moves:
+            return None
+        
+        started = time.perf_counter()
+        move, source = self._choose_computer_move(stop_event)
+        if source == "search":  # 逐次・並列の探索と終盤の読み切り
+            stats = dict(self.engine.last_stats)
+        else:
+            stats = {"source": source, "move": list(move), "seconds": time.perf_counter() - started}
+        stats.update(difficulty=self.difficulty, player=self.current_player, ply=len(self.history))
+        self.last_stats = stats
+        if self.stats_log is not None:
+            import json
+            with open(self.stats_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(stats) + "\n")
+        return move
+    
+    # (手, 手の決め方) を返す
+    def _choose_computer_move(self, stop_event):
+        if self.difficulty == 1:  # 初級: ランダム
+            return random.choice(self.valid_moves), "random"
+        
+        elif self.difficulty == 2:  # 中級: 最も多く石を取れる手
+            best_move = None
+            max_flips = -1
+            
+            for move in self.valid_moves:
+                row, col = move
+                flips_count = self.count_flips(row, col)
+                if flips_count > max_flips:
+                    max_flips = flips_count
+                    best_move = move
+            
+            return best_move, "greedy"
+        
+        elif self.difficulty == 3:  # 上級: 定石ブック, なければαβ探索
+            from othello_book import get_default_book
+            book = get_default_book() if self.use_book else None
+            # 評価値の尺度が違うので、探索と違う評価関数で作ったブックは使わない
+            if book is not None and book.evaluation == self.evaluation:
+                move = book.choose(self, self.book_margin)
+                if move is not None:
+                    return move, "book"
+            return self.get_search_engine().search(self, stop_event), "search"
+    
+    # 上級で使う探索エンジン (置換表を使い回すため1つだけ作り、設定は毎回反映する)
+    def get_search_engine(self):
+        if self.engine is None:
+            evaluator = None
+            if self.evaluation == "pattern":
+                from othello_pattern import PatternEvaluator
+                evaluator = PatternEvaluator()
+            if self.search_workers > 1:
+                from othello_parallel import ParallelSearch
+                self.engine = ParallelSearch(self.search_workers, evaluator=evaluator)
+            else:
+                self.engine = SearchEngine(evaluator=evaluator)
+        self.engine.max_depth = self.search_depth
+        self.engine.time_limit = self.search_time
+        self.engine.endgame_empties = self.endgame_empties
+        self.engine.profile = self.search_profile
+        return self.engine
+    
+    # 指定した位置に石を置いた場合に裏返せる石の数を計算
+    def count_flips(self, row, col):
+        square = row * BOARD_SIZE + col
+        if (self.black | self.white) >> square & 1:
+            return 0
+        
+        return popcount(self.get_flips(square))
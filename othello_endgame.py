@@ -0,0 +1,218 @@
+"""終盤の完全読み (pygame非依存)
+
+空きマスが少なくなったら、評価関数を使わずに終局まで読み切って手を選ぶ。
+探索は OthelloGame を使わず、手番側と相手側のビットボードだけで行う。
+
+- 勝敗モード (exact=False): 勝ち/負け/引き分けだけを確定させる (窓 -1..1)
+- 石差モード (exact=True): 最終的な石差を正確に求める
+
+手の並べ替えは、空きマスが多いうちは相手の着手可能数が少ない順 (速さ優先)、
+少なくなったら空きマスが奇数個の領域 (4x4の4分割) を優先する偶数理論の順にする。
+残り4マス以下は合法手生成をせず、残った空きマスに直接打てるかを調べる専用の関数で読む。
+"""
+from othello_bitboard import (BOARD_SIZE, FULL_MASK, SQUARE_COORDS, get_flips, get_moves,
+                              iter_squares, popcount)
+
+# 4x4 の4つの領域
+QUADRANT_MASKS = (0x000000000F0F0F0F, 0x00000000F0F0F0F0,
+                  0x0F0F0F0F00000000, 0xF0F0F0F000000000)
+# マス番号 -> 領域番号
+QUADRANT_OF = [next(q for q, mask in enumerate(QUADRANT_MASKS) if mask >> square & 1)
+               for square in range(BOARD_SIZE * BOARD_SIZE)]
+
+# 空きマスがこれより多いときは速さ優先 (相手の着手可能数順) に並べる
+FASTEST_FIRST_EMPTIES = 7
+
+_INFINITY = BOARD_SIZE * BOARD_SIZE + 1
+
+# 中断の確認間隔 (ノード数, 2のべき乗 - 1 でマスクする)
+STOP_CHECK_INTERVAL = 1023
+
+
+class SolveCancelled(Exception):
+    """stop_event による読み切りの中断"""
+
+
+def count_empties(game):
+    return BOARD_SIZE * BOARD_SIZE - popcount(game.black | game.white)
+
+
+def _parity(empties):
+    # 空きマスが奇数個の領域のビットを立てる
+    parity = 0
+    for quadrant, mask in enumerate(QUADRANT_MASKS):
+        if popcount(empties & mask) & 1:
+            parity |= 1 << quadrant
+    return parity
+
+
+def _parity_order(squares, empties):
+    # 奇数領域のマスを先にする (同じ領域の中ではマス番号順)
+    parity = _parity(empties)
+    return sorted(squares, key=lambda square: not parity >> QUADRANT_OF[square] & 1)
+
+
+class EndgameSolver:
+    """終局までの完全読み
+
+    exact が True なら石差、False なら勝敗 (1: 勝ち, 0: 引き分け, -1: 負け) を求める。
+    """
+
+    def __init__(self, exact=True):
+        self.exact = exact
+        self.nodes = 0
+        self._stop_event = None
+
+    def solve(self, game, stop_event=None):
+        """game の手番側の最善手 (row, col) と、その手の評価 (石差または勝敗) を返す
+
+        stop_event がセットされたら SolveCancelled を送出する。
+        """
+        self.nodes = 0
+        self._stop_event = stop_event
+        if not game.moves:
+            return None, 0
+
+        player, opponent = game.get_bitboards()
+        empties = ~(player | opponent) & FULL_MASK
+        alpha, beta = (-_INFINITY, _INFINITY) if self.exact else (-1, 1)
+
+        best_move = None
+        for square in self._order(player, opponent, game.moves, empties):
+            flips = get_flips(player, opponent, square)
+            score = -self._solve(opponent ^ flips, player | flips | (1 << square),
+                                 -beta, -alpha, empties ^ (1 << square))
+            if score > alpha or best_move is None:
+                alpha = max(alpha, score)
+                best_move = square
+                if alpha >= beta:
+                    break
+
+        if not self.exact:
+            alpha = (alpha > 0) - (alpha < 0)
+        return SQUARE_COORDS[best_move], alpha
+
+    def _order(self, player, opponent, moves, empties):
+        squares = _parity_order(list(iter_squares(moves)), empties)
+        if popcount(empties) > FASTEST_FIRST_EMPTIES:
+            # 速さ優先: 打った後の相手の合法手が少ない順 (同数なら偶数理論の順を保つ)
+            def opponent_mobility(square):
+                flips = get_flips(player, opponent, square)
+                return popcount(get_moves(opponent ^ flips, player | flips | (1 << square)))
+            squares.sort(key=opponent_mobility)
+        return squares
+
+    def _solve(self, player, opponent, alpha, beta, empties):
+        count = popcount(empties)
+        if count <= 4:
+            squares = _parity_order(list(iter_squares(empties)), empties)
+            if count == 4:
+                return self._solve4(player, opponent, alpha, beta, *squares)
+            if count == 3:
+                return self._solve3(player, opponent, alpha, beta, *squares)
+            if count == 2:
+                return self._solve2(player, opponent, alpha, beta, *squares)
+            if count == 1:
+                return self._solve1(player, opponent, *squares)
+            return popcount(player) - popcount(opponent)
+
+        self.nodes += 1
+        if (not self.nodes & STOP_CHECK_INTERVAL and self._stop_event is not None
+                and self._stop_event.is_set()):
+            raise SolveCancelled()
+        moves = get_moves(player, opponent)
+        if not moves:
+            if not get_moves(opponent, player):
+                return popcount(player) - popcount(opponent)
+            # パス
+            return -self._solve(opponent, player, -beta, -alpha, empties)
+
+        best = -_INFINITY
+        for square in self._order(player, opponent, moves, empties):
+            flips = get_flips(player, opponent, square)
+            score = -self._solve(opponent ^ flips, player | flips | (1 << square),
+                                 -beta, -alpha, empties ^ (1 << square))
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    # 以下は残り1〜4マス専用。合法手生成をせず、残った空きマスに打てるかだけを調べる
+
+    def _solve4(self, player, opponent, alpha, beta, x1, x2, x3, x4, passed=False):
+        self.nodes += 1
+        best = -_INFINITY
+        for x, a, b, c in ((x1, x2, x3, x4), (x2, x1, x3, x4), (x3, x1, x2, x4), (x4, x1, x2, x3)):
+            flips = get_flips(player, opponent, x)
+            if flips:
+                score = -self._solve3(opponent ^ flips, player | flips | (1 << x),
+                                      -beta, -alpha, a, b, c)
+                if score > best:
+                    best = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            return best
+
+        if best == -_INFINITY:
+            if passed:
+                return popcount(player) - popcount(opponent)
+            return -self._solve4(opponent, player, -beta, -alpha, x1, x2, x3, x4, True)
+        return best
+
+    def _solve3(self, player, opponent, alpha, beta, x1, x2, x3, passed=False):
+        self.nodes += 1
+        best = -_INFINITY
+        for x, a, b in ((x1, x2, x3), (x2, x1, x3), (x3, x1, x2)):
+            flips = get_flips(player, opponent, x)
+            if flips:
+                score = -self._solve2(opponent ^ flips, player | flips | (1 << x),
+                                      -beta, -alpha, a, b)
+                if score > best:
+                    best = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            return best
+
+        if best == -_INFINITY:
+            if passed:
+                return popcount(player) - popcount(opponent)
+            return -self._solve3(opponent, player, -beta, -alpha, x1, x2, x3, True)
+        return best
+
+    def _solve2(self, player, opponent, alpha, beta, x1, x2, passed=False):
+        self.nodes += 1
+        best = -_INFINITY
+        flips = get_flips(player, opponent, x1)
+        if flips:
+            best = -self._solve1(opponent ^ flips, player | flips | (1 << x1), x2)
+            if best >= beta:
+                return best
+        flips = get_flips(player, opponent, x2)
+        if flips:
+            score = -self._solve1(opponent ^ flips, player | flips | (1 << x2), x1)
+            if score > best:
+                best = score
+
+        if best == -_INFINITY:
+            if passed:
+                return popcount(player) - popcount(opponent)
+            return -self._solve2(opponent, player, -beta, -alpha, x1, x2, True)
+        return best
+
+    def _solve1(self, player, opponent, x):
+        # 空きマスが1つなら石の合計は63個
+        self.nodes += 1
+        count = popcount(player)
+        flips = get_flips(player, opponent, x)
+        if flips:
+            return 2 * (count + popcount(flips) + 1) - 64
+        flips = get_flips(opponent, player, x)
+        if flips:
+            return 2 * (count - popcount(flips)) - 64
+        return 2 * count - 63
+
@@ -0,0 +1,86 @@
+"""局面の評価 (pygame非依存)
+
+評価値はすべて手番側から見た値 (大きいほど手番側が有利)。
+mobility_features だけは、パターン評価の表と合わせて黒から見た値を返す。
+"""
+from othello_bitboard import BOARD_SIZE, FULL_MASK, get_moves, neighbours, popcount
+
+# 評価ボード (角と辺を高く評価)
+EVAL_BOARD = [
+    [100, -20, 10, 5, 5, 10, -20, 100],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [10, -2, -1, -1, -1, -1, -2, 10],
+    [5, -2, -1, -1, -1, -1, -2, 5],
+    [5, -2, -1, -1, -1, -1, -2, 5],
+    [10, -2, -1, -1, -1, -1, -2, 10],
+    [-20, -50, -2, -2, -2, -2, -50, -20],
+    [100, -20, 10, 5, 5, 10, -20, 100]
+]
+
+# 終局したときの評価値 (勝ちは盤面評価より必ず大きくなるようにする)
+WIN_SCORE = 10000
+
+
+def _build_weight_masks():
+    # 同じ重みのマスを1つのマスクにまとめる
+    masks = {}
+    for row in range(BOARD_SIZE):
+        for col in range(BOARD_SIZE):
+            weight = EVAL_BOARD[row][col]
+            masks[weight] = masks.get(weight, 0) | 1 << (row * BOARD_SIZE + col)
+    return tuple(masks.items())
+
+
+WEIGHT_MASKS = _build_weight_masks()
+
+
+def evaluate(game):
+    """手番側から見た盤面の評価値を返す"""
+    player, opponent = game.get_bitboards()
+    score = 0
+    for weight, mask in WEIGHT_MASKS:
+        score += weight * (popcount(player & mask) - popcount(opponent & mask))
+    return score
+
+
+def final_score(game):
+    """終局した局面の手番側から見た評価値を返す"""
+    player, opponent = game.get_bitboards()
+    diff = popcount(player) - popcount(opponent)
+    if diff > 0:
+        return WIN_SCORE + diff
+    if diff < 0:
+        return -WIN_SCORE + diff
+    return 0
+
+
+# 角のマス
+CORNER_MASK = 0x8100000000000081
+
+
+def mobility_features(game):
+    """黒から見た (合法手の数の差, 潜在的な合法手の数の差, 開放度の差) を返す
+
+    潜在的な合法手は相手の石と隣り合う空きマスの数、開放度は空きマスと隣り合う自分の石の数。
+    どれもビットボードのシフトとマスク演算数回で求まるので、push/pop では更新せずに評価する局面で求める。
+    """
+    player, opponent = game.get_bitboards()
+    black, white = game.black, game.white
+    empty = ~(black | white) & FULL_MASK
+    mobility = popcount(game.moves) - popcount(get_moves(opponent, player))
+    if game.current_player != 1:
+        mobility = -mobility
+    near_empty = neighbours(empty)
+    return (mobility, popcount(empty & neighbours(white)) - popcount(empty & neighbours(black)),
+            popcount(black & near_empty) - popcount(white & near_empty))
+
+
+def evaluate_mobility(game):
+    """手番側から見た、石の数・角・合法手の数による評価値 (old/othello_advanced.py の上級の evaluate_board と同じ値)
+
+    手番側の合法手は game.moves を使うので、末端の局面で数え直すのは相手の合法手だけ。
+    """
+    player, opponent = game.get_bitboards()
+    return (popcount(player) - popcount(opponent)
+            + 10 * (popcount(player & CORNER_MASK) - popcount(opponent & CORNER_MASK))
+            + 2 * (popcount(game.moves) - popcount(get_moves(opponent, player))))
@@ -2,8 +2,8 @@ import pygame
 import sys
 import os
 
-# 初期化
-pygame.init()
+from othello_core import OthelloGame
+from othello_render import BoardRenderer, FrameScheduler, TextCache
 
 # 定数
 SCREEN_WIDTH = 800
@@ -18,17 +18,31 @@ GREEN = (0, 128, 0)
 DARK_GREEN = (0, 100, 0)
 LIGHT_GREEN = (144, 238, 144)
 
-# 画面設定
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Othello")
-clock = pygame.time.Clock()
+# 画面とフォント (init_display で作成する)
+screen = None
+scheduler = None
+default_font = None
+# 盤面の差分描画
+board_renderer = None
 
-# フォント設定
-# デフォルトフォントを使用
-default_font = pygame.font.SysFont(None, 36)
+# 初期化 (import しただけではウィンドウを開かない)
+def init_display():
+    global screen, scheduler, default_font, board_renderer
+    pygame.init()
+    
+    # 画面設定
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Othello")
+    scheduler = FrameScheduler()
+    
+    # フォント設定
+    # デフォルトフォントを使用
+    default_font = pygame.font.SysFont(None, 36)
+    
+    board_renderer = BoardRenderer(screen, BOARD_OFFSET_X, BOARD_OFFSET_Y, CELL_SIZE, render_text)
 
-# 日本語テキスト描画関数
-def draw_text(text, font, color, surface, x, y):
+# 日本語テキストを英語に置き換えて Surface に描く
+def _render_translated(text, font, color, antialias):
     if font == default_font:
         # 日本語テキストを英語に置き換え
         text = text.replace("黒", "Black").replace("白", "White")
@@ -37,155 +51,45 @@ def draw_text(text, font, color, surface, x, y):
         text = text.replace("引き分け!", "Draw!")
         text = text.replace("Rキーでリスタート", "Press R to Restart")
     
-    text_obj = font.render(text, True, color)
+    return font.render(text, antialias, color)
+
+# 描画済みの文字列のキャッシュ (置き換えと描画は文字列ごとに1回だけ行う)
+text_cache = TextCache(_render_translated)
+
+def render_text(text, font, color):
+    return text_cache.get(text, font, color)
+
+# 日本語テキスト描画関数
+def draw_text(text, font, color, surface, x, y):
+    text_obj = render_text(text, font, color)
     text_rect = text_obj.get_rect()
     text_rect.topleft = (x, y)
     surface.blit(text_obj, text_rect)
 
-class OthelloGame:
-    def __init__(self):
-        # ボード初期化 (0: 空, 1: 黒, 2: 白)
-        self.board = [[0 for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
-        # 初期配置
-        self.board[3][3] = 2  # 白
-        self.board[3][4] = 1  # 黒
-        self.board[4][3] = 1  # 黒
-        self.board[4][4] = 2  # 白
-        
-        # 黒のターンから開始
-        self.current_player = 1
-        self.game_over = False
-        self.valid_moves = self.get_valid_moves()
-        
-    def get_opponent(self):
-        return 2 if self.current_player == 1 else 1
-    
-    def is_valid_position(self, row, col):
-        return 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE
-    
-    def get_valid_moves(self):
-        valid_moves = []
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
-                if self.board[row][col] == 0 and self.is_valid_move(row, col):
-                    valid_moves.append((row, col))
-        return valid_moves
-    
-    def is_valid_move(self, row, col):
-        if self.board[row][col] != 0:
-            return False
-        
-        opponent = self.get_opponent()
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            r, c = row + dr, col + dc
-            if not self.is_valid_position(r, c) or self.board[r][c] != opponent:
-                continue
-                
-            r += dr
-            c += dc
-            while self.is_valid_position(r, c):
-                if self.board[r][c] == 0:
-                    break
-                if self.board[r][c] == self.current_player:
-                    return True
-                r += dr
-                c += dc
-                
-        return False
-    
-    def make_move(self, row, col):
-        if (row, col) not in self.valid_moves:
-            return False
-        
-        self.board[row][col] = self.current_player
-        opponent = self.get_opponent()
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            flips = []
-            r, c = row + dr, col + dc
-            
-            while self.is_valid_position(r, c) and self.board[r][c] == opponent:
-                flips.append((r, c))
-                r += dr
-                c += dc
-                
-            if self.is_valid_position(r, c) and self.board[r][c] == self.current_player and flips:
-                for flip_r, flip_c in flips:
-                    self.board[flip_r][flip_c] = self.current_player
-        
-        # ターン交代
-        self.current_player = opponent
-        self.valid_moves = self.get_valid_moves()
-        
-        # 相手がパスの場合
-        if not self.valid_moves:
-            self.current_player = self.get_opponent()
-            self.valid_moves = self.get_valid_moves()
-            
-            # ゲーム終了判定
-            if not self.valid_moves:
-                self.game_over = True
-                
-        return True
-    
-    def count_discs(self):
-        black_count = sum(row.count(1) for row in self.board)
-        white_count = sum(row.count(2) for row in self.board)
-        return black_count, white_count
-    
-    def get_winner(self):
-        black_count, white_count = self.count_discs()
-        if black_count > white_count:
-            return "黒の勝ち!"
-        elif white_count > black_count:
-            return "白の勝ち!"
-        else:
-            return "引き分け!"
-
 def draw_board(game):
-    # 背景
-    screen.fill(DARK_GREEN)
-    
-    # ボード
-    for row in range(BOARD_SIZE):
-        for col in range(BOARD_SIZE):
-            x = BOARD_OFFSET_X + col * CELL_SIZE
-            y = BOARD_OFFSET_Y + row * CELL_SIZE
-            
-            # マス目
-            pygame.draw.rect(screen, GREEN, (x, y, CELL_SIZE, CELL_SIZE))
-            pygame.draw.rect(screen, BLACK, (x, y, CELL_SIZE, CELL_SIZE), 1)
-            
-            # 石
-            if game.board[row][col] == 1:  # 黒
-                pygame.draw.circle(screen, BLACK, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), CELL_SIZE // 2 - 5)
-            elif game.board[row][col] == 2:  # 白
-                pygame.draw.circle(screen, WHITE, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), CELL_SIZE // 2 - 5)
-            
-            # 有効な手の表示
-            if (row, col) in game.valid_moves:
-                pygame.draw.circle(screen, LIGHT_GREEN, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), 10)
-    
     # スコア表示
     black_count, white_count = game.count_discs()
-    draw_text(f"黒: {black_count}", default_font, BLACK, screen, 50, 50)
-    draw_text(f"白: {white_count}", default_font, WHITE, screen, 50, 100)
+    texts = [
+        (f"黒: {black_count}", default_font, BLACK, (50, 50)),
+        (f"白: {white_count}", default_font, WHITE, (50, 100)),
+    ]
     
     # 現在のプレイヤー表示
     if not game.game_over:
-        draw_text(f"現在のプレイヤー: {'黒' if game.current_player == 1 else '白'}", default_font, BLACK, screen, SCREEN_WIDTH - 300, 50)
+        texts.append((f"現在のプレイヤー: {'黒' if game.current_player == 1 else '白'}", default_font, BLACK, (SCREEN_WIDTH - 300, 50)))
     else:
-        draw_text(game.get_winner(), default_font, BLACK, screen, SCREEN_WIDTH - 300, 50)
-        draw_text("Rキーでリスタート", default_font, BLACK, screen, SCREEN_WIDTH - 300, 100)
+        texts.append((game.get_winner(), default_font, BLACK, (SCREEN_WIDTH - 300, 50)))
+        texts.append(("Rキーでリスタート", default_font, BLACK, (SCREEN_WIDTH - 300, 100)))
+    
+    # 前のフレームから変わったマスと文字列だけを描き直し、描いた矩形のリストを返す
+    return board_renderer.draw(game, texts)
 
 def main():
     game = OthelloGame()
+    events = []
     
     while True:
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -202,11 +106,14 @@ def main():
             
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r and game.game_over:
+                    game.close()
                     game = OthelloGame()
         
-        draw_board(game)
-        pygame.display.flip()
-        clock.tick(60)
+        # 変わった部分だけを画面に反映する
+        pygame.display.update(draw_board(game))
+        # 入力があるまで眠る
+        events = scheduler.wait()
 
 if __name__ == "__main__":
+    init_display()
     main()
@@ -1,9 +1,11 @@
+import functools
 import pygame
 import sys
-import random
 
-# 初期化
-pygame.init()
+from othello_core import OthelloGame
+from othello_record import load_game, save_game
+from othello_render import TEXT_CACHE_SIZE, BoardRenderer, FrameScheduler, SpatialGrid, TextCache
+from othello_worker import ComputerWorker
 
 # 定数
 SCREEN_WIDTH = 800
@@ -18,96 +20,126 @@ GREEN = (0, 128, 0)
 DARK_GREEN = (0, 100, 0)
 LIGHT_GREEN = (144, 238, 144)
 GRAY = (128, 128, 128)
+# コンピュータの計算が終わったときに描画ループを起こすイベント
+AI_DONE_EVENT = pygame.USEREVENT + 1
+# 「考え中...」の点を増やす間隔 (ミリ秒)
+THINKING_BLINK_MS = 250
+# 探索の統計の表示位置 (盤面の下) と行の間隔
+STATS_POS = (BOARD_OFFSET_X, BOARD_OFFSET_Y + BOARD_SIZE * CELL_SIZE + 4)
+STATS_LINE_HEIGHT = 18
+# Sキー・Lキーで保存・読み込みする棋譜ファイルと、その結果を表示する時間 (ミリ秒)
+SAVE_PATH = "saved_game.otr"
+MESSAGE_MS = 2000
 
-# 画面設定
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Othello")
-clock = pygame.time.Clock()
+# 日本語テキストを英語に置き換える対応表 (上から順に置き換える)
+TEXT_MAPPING = {
+    "黒": "Black",
+    "白": "White",
+    "現在のプレイヤー:": "Current Player:",
+    "黒の勝ち!": "Black Wins!",
+    "白の勝ち!": "White Wins!",
+    "引き分け!": "Draw!",
+    "Rキーでリスタート": "Press R to Restart",
+    "Mキーでメニューに戻る": "Press M for Menu",
+    "オセロ": "Othello",
+    "対人モード": "VS Player",
+    "コンピュータ対戦": "VS Computer",
+    "コンピュータ対戦 (初級)": "VS Computer (Easy)",
+    "コンピュータ対戦 (中級)": "VS Computer (Medium)",
+    "コンピュータ対戦 (上級)": "VS Computer (Hard)",
+    "初級": "Easy",
+    "中級": "Medium",
+    "上級": "Hard",
+    "終了": "Exit",
+    "考え中": "Thinking",
+    "保存しました": "Saved",
+    "読み込みました": "Loaded",
+    "読み込めません": "Cannot load"
+}
 
-# フォント設定
-title_font = pygame.font.SysFont(None, 72)
-menu_font = pygame.font.SysFont(None, 48)
-default_font = pygame.font.SysFont(None, 36)
+# 画面とフォント (init_display で作成する)
+screen = None
+scheduler = None
+title_font = None
+menu_font = None
+default_font = None
+stats_font = None
+# 盤面の差分描画とメニュー画面
+board_renderer = None
+menu_screen = None
 
-# 日本語テキスト描画関数
-def draw_text(text, font, color, surface, x, y):
-    # 日本語テキストを英語に置き換え
-    text_mapping = {
-        "黒": "Black",
-        "白": "White",
-        "現在のプレイヤー:": "Current Player:",
-        "黒の勝ち!": "Black Wins!",
-        "白の勝ち!": "White Wins!",
-        "引き分け!": "Draw!",
-        "Rキーでリスタート": "Press R to Restart",
-        "Mキーでメニューに戻る": "Press M for Menu",
-        "オセロ": "Othello",
-        "対人モード": "VS Player",
-        "コンピュータ対戦": "VS Computer",
-        "コンピュータ対戦 (初級)": "VS Computer (Easy)",
-        "コンピュータ対戦 (中級)": "VS Computer (Medium)",
-        "コンピュータ対戦 (上級)": "VS Computer (Hard)",
-        "初級": "Easy",
-        "中級": "Medium",
-        "上級": "Hard",
-        "終了": "Exit"
-    }
+# 初期化 (import しただけではウィンドウを開かない)
+def init_display():
+    global screen, scheduler, title_font, menu_font, default_font, stats_font, board_renderer, menu_screen
+    pygame.init()
     
-    # テキスト置換
-    for jp, en in text_mapping.items():
-        text = text.replace(jp, en)
+    # 画面設定
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Othello")
+    scheduler = FrameScheduler()
     
-    text_obj = font.render(text, True, color)
+    # フォント設定
+    title_font = pygame.font.SysFont(None, 72)
+    menu_font = pygame.font.SysFont(None, 48)
+    default_font = pygame.font.SysFont(None, 36)
+    stats_font = pygame.font.SysFont(None, 22)
+    
+    board_renderer = BoardRenderer(screen, BOARD_OFFSET_X, BOARD_OFFSET_Y, CELL_SIZE, render_text)
+    menu_screen = MenuScreen(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+# 日本語テキストを英語に置き換え (同じ文字列は2回目以降キャッシュから返す)
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def translate(text):
+    for jp, en in TEXT_MAPPING.items():
+        text = text.replace(jp, en)
+    return text
+
+def _render_translated(text, font, color, antialias):
+    return font.render(translate(text), antialias, color)
+
+# 描画済みの文字列のキャッシュ (置き換えと描画は文字列ごとに1回だけ行う)
+text_cache = TextCache(_render_translated)
+
+# 日本語テキストを英語に置き換えて Surface に描く
+def render_text(text, font, color):
+    return text_cache.get(text, font, color)
+
+# 日本語テキスト描画関数
+def draw_text(text, font, color, surface, x, y):
+    text_obj = render_text(text, font, color)
     text_rect = text_obj.get_rect()
     text_rect.topleft = (x, y)
     surface.blit(text_obj, text_rect)
 
 # ボタンクラス
 class Button:
-    def __init__(self, x, y, width, height, text, font, color, hover_color):
+    def __init__(self, x, y, width, height, text, font, color, hover_color, action=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.font = font
         self.color = color
         self.hover_color = hover_color
         self.is_hovered = False
+        # クリックされたときの動作 (メニューでは (ゲームモード, 難易度), None は終了)
+        self.action = action
         
         # 日本語テキストを英語に置き換え
-        self.display_text = text
-        text_mapping = {
-            "黒": "Black",
-            "白": "White",
-            "現在のプレイヤー:": "Current Player:",
-            "黒の勝ち!": "Black Wins!",
-            "白の勝ち!": "White Wins!",
-            "引き分け!": "Draw!",
-            "Rキーでリスタート": "Press R to Restart",
-            "Mキーでメニューに戻る": "Press M for Menu",
-            "オセロ": "Othello",
-            "対人モード": "VS Player",
-            "コンピュータ対戦": "VS Computer",
-            "コンピュータ対戦 (初級)": "VS Computer (Easy)",
-            "コンピュータ対戦 (中級)": "VS Computer (Medium)",
-            "コンピュータ対戦 (上級)": "VS Computer (Hard)",
-            "初級": "Easy",
-            "中級": "Medium",
-            "上級": "Hard",
-            "終了": "Exit"
-        }
-        
-        # テキスト置換
-        for jp, en in text_mapping.items():
-            self.display_text = self.display_text.replace(jp, en)
+        self.display_text = translate(text)
         
     def draw(self, surface):
         color = self.hover_color if self.is_hovered else self.color
         pygame.draw.rect(surface, color, self.rect)
         pygame.draw.rect(surface, BLACK, self.rect, 2)
         
-        text_obj = self.font.render(self.display_text, True, BLACK)
+        text_obj = render_text(self.text, self.font, BLACK)
         text_rect = text_obj.get_rect(center=self.rect.center)
         surface.blit(text_obj, text_rect)
         
+    # ボタンと文字列の両方を含む矩形 (文字列がボタンからはみ出すことがある)
+    def get_bounds(self):
+        text_rect = render_text(self.text, self.font, BLACK).get_rect(center=self.rect.center)
+        return self.rect.union(text_rect)
+        
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
         return self.is_hovered
@@ -117,312 +149,183 @@ class Button:
             return self.rect.collidepoint(pos)
         return False
 
-class OthelloGame:
-    def __init__(self):
-        # ボード初期化 (0: 空, 1: 黒, 2: 白)
-        self.board = [[0 for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
-        # 初期配置
-        self.board[3][3] = 2  # 白
-        self.board[3][4] = 1  # 黒
-        self.board[4][3] = 1  # 黒
-        self.board[4][4] = 2  # 白
-        
-        # 黒のターンから開始
-        self.current_player = 1
-        self.game_over = False
-        self.valid_moves = self.get_valid_moves()
-        
-        # ゲームモード (0: 対人, 1: コンピュータ)
-        self.game_mode = 0
-        # 難易度 (1: 初級, 2: 中級, 3: 上級)
-        self.difficulty = 1
-        
-    def get_opponent(self):
-        return 2 if self.current_player == 1 else 1
+# コンピュータの手の統計 (OthelloGame.last_stats) を表示用の行のリストにする
+def format_stats(stats):
+    if stats is None:
+        return ["No computer move yet"]
+    move = "abcdefgh"[stats["move"][1]] + str(stats["move"][0] + 1)
+    if stats["source"] not in ("search", "endgame", "parallel"):
+        return [f"{stats['source']} move {move} ({stats['seconds'] * 1000:.1f} ms)"]
+    
+    lines = [f"{stats['source']} {move}  depth {stats['depth']}  nodes {stats['nodes']:,}"
+             f"  {stats['nps'] / 1000:.0f}k nps  {stats['seconds']:.2f} s"]
+    branching = stats["branching_factor"]
+    lines.append(f"TT hit {stats['tt_hit_rate'] * 100:.1f}%"
+                 + (f"  branching {branching:.2f}" if branching is not None else "")
+                 + ("  (timed out)" if stats.get("timed_out") else ""))
+    times = stats["times"]
+    if times:
+        total = sum(times.values()) or 1.0
+        lines.append("time " + "  ".join(f"{name} {seconds / total * 100:.0f}%" for name, seconds in times.items()))
+    lines.append("PV " + " ".join("abcdefgh"[col] + str(row + 1) for row, col in stats["pv"]))
+    return lines
+
+def draw_board(game, thinking=False, stats=None, show_stats=False, message=None):
+    # スコア表示
+    black_count, white_count = game.count_discs()
+    texts = [
+        (f"黒: {black_count}", default_font, BLACK, (50, 50)),
+        (f"白: {white_count}", default_font, WHITE, (50, 100)),
+    ]
     
-    def is_valid_position(self, row, col):
-        return 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE
+    # 現在のプレイヤー表示
+    if not game.game_over:
+        texts.append((f"現在のプレイヤー: {'黒' if game.current_player == 1 else '白'}", default_font, BLACK, (SCREEN_WIDTH - 300, 50)))
+        if thinking:
+            # コンピュータの思考中 (点の数を0.25秒ごとに変える)
+            dots = "." * (pygame.time.get_ticks() // THINKING_BLINK_MS % 4)
+            texts.append((f"考え中{dots}", default_font, BLACK, (SCREEN_WIDTH - 300, 100)))
+    else:
+        texts.append((game.get_winner(), default_font, BLACK, (SCREEN_WIDTH - 300, 50)))
+        texts.append(("Rキーでリスタート", default_font, BLACK, (SCREEN_WIDTH - 300, 100)))
+        texts.append(("Mキーでメニューに戻る", default_font, BLACK, (SCREEN_WIDTH - 300, 150)))
     
-    def get_valid_moves(self):
-        valid_moves = []
-        for row in range(BOARD_SIZE):
-            for col in range(BOARD_SIZE):
-                if self.board[row][col] == 0 and self.is_valid_move(row, col):
-                    valid_moves.append((row, col))
-        return valid_moves
+    # 保存・読み込みの結果
+    if message:
+        texts.append((message, default_font, WHITE, (SCREEN_WIDTH // 2 - 60, 15)))
     
-    def is_valid_move(self, row, col):
-        if self.board[row][col] != 0:
-            return False
-        
-        opponent = self.get_opponent()
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            r, c = row + dr, col + dc
-            if not self.is_valid_position(r, c) or self.board[r][c] != opponent:
-                continue
-                
-            r += dr
-            c += dc
-            while self.is_valid_position(r, c):
-                if self.board[r][c] == 0:
-                    break
-                if self.board[r][c] == self.current_player:
-                    return True
-                r += dr
-                c += dc
-                
-        return False
+    # Iキーで切り替える探索の統計
+    if show_stats:
+        x, y = STATS_POS
+        for index, line in enumerate(format_stats(stats)):
+            texts.append((line, stats_font, WHITE, (x, y + index * STATS_LINE_HEIGHT)))
     
-    def make_move(self, row, col):
-        if (row, col) not in self.valid_moves:
-            return False
-        
-        self.board[row][col] = self.current_player
-        opponent = self.get_opponent()
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        
-        for dr, dc in directions:
-            flips = []
-            r, c = row + dr, col + dc
-            
-            while self.is_valid_position(r, c) and self.board[r][c] == opponent:
-                flips.append((r, c))
-                r += dr
-                c += dc
-                
-            if self.is_valid_position(r, c) and self.board[r][c] == self.current_player and flips:
-                for flip_r, flip_c in flips:
-                    self.board[flip_r][flip_c] = self.current_player
-        
-        # ターン交代
-        self.current_player = opponent
-        self.valid_moves = self.get_valid_moves()
+    # 前のフレームから変わったマスと文字列だけを描き直し、描いた矩形のリストを返す
+    return board_renderer.draw(game, texts)
+
+# メニュー画面 (ボタンは最初に1回だけ作り、ホバーが変わったボタンだけを描き直す)
+class MenuScreen:
+    def __init__(self, width, height):
+        # ボタンはウィンドウの大きさに合わせて1回だけ配置する (ウィンドウの大きさは変えられない)
+        x = width // 2 - 150
+        self.title_pos = (width // 2 - 100, 100)
+        self.buttons = [
+            # 対人モード
+            Button(x, 250, 300, 60, "対人モード", menu_font, LIGHT_GREEN, GREEN, action=(0, 1)),
+            # コンピュータ対戦 (難易度別)
+            Button(x, 330, 300, 60, "コンピュータ対戦 (初級)", menu_font, LIGHT_GREEN, GREEN, action=(1, 1)),
+            Button(x, 410, 300, 60, "コンピュータ対戦 (中級)", menu_font, LIGHT_GREEN, GREEN, action=(1, 2)),
+            Button(x, 490, 300, 60, "コンピュータ対戦 (上級)", menu_font, LIGHT_GREEN, GREEN, action=(1, 3)),
+            # 終了ボタン
+            Button(x, 570, 300, 60, "終了", menu_font, LIGHT_GREEN, GREEN),
+        ]
         
-        # 相手がパスの場合
-        if not self.valid_moves:
-            self.current_player = self.get_opponent()
-            self.valid_moves = self.get_valid_moves()
-            
-            # ゲーム終了判定
-            if not self.valid_moves:
-                self.game_over = True
-                
-        return True
+        # 当たり判定用の格子
+        self.grid = SpatialGrid()
+        for button in self.buttons:
+            self.grid.insert(button, button.rect)
+        self.hovered = None
+        self.needs_redraw = True
     
-    def count_discs(self):
-        black_count = sum(row.count(1) for row in self.board)
-        white_count = sum(row.count(2) for row in self.board)
-        return black_count, white_count
+    # 次のフレームで全体を描き直す (ゲーム画面から戻ったときなど)
+    def invalidate(self):
+        self.needs_redraw = True
     
-    def get_winner(self):
-        black_count, white_count = self.count_discs()
-        if black_count > white_count:
-            return "黒の勝ち!"
-        elif white_count > black_count:
-            return "白の勝ち!"
-        else:
-            return "引き分け!"
+    # pos にあるボタンを返す (なければ None)
+    def hit_test(self, pos):
+        return self.grid.query(pos)
     
-    # コンピュータの手を計算
-    def get_computer_move(self):
-        if not self.valid_moves:
-            return None
-        
-        if self.difficulty == 1:  # 初級: ランダム
-            return random.choice(self.valid_moves)
-        
-        elif self.difficulty == 2:  # 中級: 最も多く石を取れる手
-            best_move = None
-            max_flips = -1
-            
-            for move in self.valid_moves:
-                row, col = move
-                flips_count = self.count_flips(row, col)
-                if flips_count > max_flips:
-                    max_flips = flips_count
-                    best_move = move
-            
-            return best_move
+    # ホバーを更新して変わった部分を描き、画面に反映する矩形のリストを返す
+    def update(self, surface, mouse_pos):
+        hovered = self.hit_test(mouse_pos)
         
-        elif self.difficulty == 3:  # 上級: 評価関数を使用
-            best_move = None
-            best_score = float('-inf')
-            
-            # 評価ボード (角と辺を高く評価)
-            eval_board = [
-                [100, -20, 10, 5, 5, 10, -20, 100],
-                [-20, -50, -2, -2, -2, -2, -50, -20],
-                [10, -2, -1, -1, -1, -1, -2, 10],
-                [5, -2, -1, -1, -1, -1, -2, 5],
-                [5, -2, -1, -1, -1, -1, -2, 5],
-                [10, -2, -1, -1, -1, -1, -2, 10],
-                [-20, -50, -2, -2, -2, -2, -50, -20],
-                [100, -20, 10, 5, 5, 10, -20, 100]
-            ]
+        if self.needs_redraw:
+            self.needs_redraw = False
+            self.hovered = hovered
+            surface.fill(DARK_GREEN)
             
-            for move in self.valid_moves:
-                row, col = move
-                # 位置の評価値 + 裏返せる石の数
-                score = eval_board[row][col] + self.count_flips(row, col) * 2
-                if score > best_score:
-                    best_score = score
-                    best_move = move
+            # タイトル
+            draw_text("オセロ", title_font, WHITE, surface, *self.title_pos)
             
-            return best_move
-    
-    # 指定した位置に石を置いた場合に裏返せる石の数を計算
-    def count_flips(self, row, col):
-        if self.board[row][col] != 0:
-            return 0
-        
-        total_flips = 0
-        opponent = self.get_opponent()
-        directions = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+            # ボタン
+            for button in self.buttons:
+                button.is_hovered = button is hovered
+                button.draw(surface)
+            return [surface.get_rect()]
         
-        for dr, dc in directions:
-            flips = 0
-            r, c = row + dr, col + dc
-            
-            while self.is_valid_position(r, c) and self.board[r][c] == opponent:
-                flips += 1
-                r += dr
-                c += dc
-                
-            if self.is_valid_position(r, c) and self.board[r][c] == self.current_player and flips > 0:
-                total_flips += flips
+        if hovered is self.hovered:
+            return []
         
-        return total_flips
-def draw_board(game):
-    # 背景
-    screen.fill(DARK_GREEN)
-    
-    # ボード
-    for row in range(BOARD_SIZE):
-        for col in range(BOARD_SIZE):
-            x = BOARD_OFFSET_X + col * CELL_SIZE
-            y = BOARD_OFFSET_Y + row * CELL_SIZE
-            
-            # マス目
-            pygame.draw.rect(screen, GREEN, (x, y, CELL_SIZE, CELL_SIZE))
-            pygame.draw.rect(screen, BLACK, (x, y, CELL_SIZE, CELL_SIZE), 1)
-            
-            # 石
-            if game.board[row][col] == 1:  # 黒
-                pygame.draw.circle(screen, BLACK, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), CELL_SIZE // 2 - 5)
-            elif game.board[row][col] == 2:  # 白
-                pygame.draw.circle(screen, WHITE, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), CELL_SIZE // 2 - 5)
-            
-            # 有効な手の表示
-            if (row, col) in game.valid_moves:
-                pygame.draw.circle(screen, LIGHT_GREEN, (x + CELL_SIZE // 2, y + CELL_SIZE // 2), 10)
-    
-    # スコア表示
-    black_count, white_count = game.count_discs()
-    draw_text(f"黒: {black_count}", default_font, BLACK, screen, 50, 50)
-    draw_text(f"白: {white_count}", default_font, WHITE, screen, 50, 100)
-    
-    # 現在のプレイヤー表示
-    if not game.game_over:
-        draw_text(f"現在のプレイヤー: {'黒' if game.current_player == 1 else '白'}", default_font, BLACK, screen, SCREEN_WIDTH - 300, 50)
-    else:
-        draw_text(game.get_winner(), default_font, BLACK, screen, SCREEN_WIDTH - 300, 50)
-        draw_text("Rキーでリスタート", default_font, BLACK, screen, SCREEN_WIDTH - 300, 100)
-        draw_text("Mキーでメニューに戻る", default_font, BLACK, screen, SCREEN_WIDTH - 300, 150)
+        # ホバーが外れたボタンと新しくホバーしたボタンだけを描き直す
+        rects = []
+        for button in (self.hovered, hovered):
+            if button is not None:
+                bounds = button.get_bounds()
+                surface.fill(DARK_GREEN, bounds)
+                button.is_hovered = button is hovered
+                button.draw(surface)
+                rects.append(bounds)
+        self.hovered = hovered
+        return rects
 
-def draw_menu():
-    screen.fill(DARK_GREEN)
-    
-    # タイトル
-    draw_text("オセロ", title_font, WHITE, screen, SCREEN_WIDTH // 2 - 100, 100)
-    
-    # メニューボタン
-    buttons = []
-    
-    # 対人モード
-    vs_player_btn = Button(SCREEN_WIDTH // 2 - 150, 250, 300, 60, "対人モード", menu_font, LIGHT_GREEN, GREEN)
-    buttons.append(vs_player_btn)
-    
-    # コンピュータ対戦 (難易度別)
-    vs_cpu_easy_btn = Button(SCREEN_WIDTH // 2 - 150, 330, 300, 60, "コンピュータ対戦 (初級)", menu_font, LIGHT_GREEN, GREEN)
-    buttons.append(vs_cpu_easy_btn)
-    
-    vs_cpu_medium_btn = Button(SCREEN_WIDTH // 2 - 150, 410, 300, 60, "コンピュータ対戦 (中級)", menu_font, LIGHT_GREEN, GREEN)
-    buttons.append(vs_cpu_medium_btn)
-    
-    vs_cpu_hard_btn = Button(SCREEN_WIDTH // 2 - 150, 490, 300, 60, "コンピュータ対戦 (上級)", menu_font, LIGHT_GREEN, GREEN)
-    buttons.append(vs_cpu_hard_btn)
-    
-    # 終了ボタン
-    exit_btn = Button(SCREEN_WIDTH // 2 - 150, 570, 300, 60, "終了", menu_font, LIGHT_GREEN, GREEN)
-    buttons.append(exit_btn)
-    
-    # マウス位置取得
-    mouse_pos = pygame.mouse.get_pos()
-    
-    # ボタン描画とホバー処理
-    for button in buttons:
-        button.check_hover(mouse_pos)
-        button.draw(screen)
-    
-    return buttons
+# コンピュータ対戦でコンピュータ (白) が打つ番かどうか
+def is_computer_turn(game):
+    return game.game_mode == 1 and game.current_player == 2 and not game.game_over
 
 def game_loop():
     game = OthelloGame()
     menu_active = True
     running = True
+    # コンピュータの手は別スレッドで計算し、その間も描画とイベント処理を続ける
+    worker = ComputerWorker(min_time=0.5, on_done=lambda: pygame.event.post(pygame.event.Event(AI_DONE_EVENT)))
+    # 探索の統計を表示するか (表示中は時間の内訳も測る)
+    show_stats = False
+    # 保存・読み込みの結果の表示と、それを消す時刻
+    message = None
+    message_until = 0
+    events = []
     
     while running:
         if menu_active:
             # メニュー画面
-            buttons = draw_menu()
-            
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    worker.shutdown()
+                    game.close()
                     pygame.quit()
                     sys.exit()
                 
-                mouse_pos = pygame.mouse.get_pos()
-                
                 # ボタンクリック処理
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    # 対人モード
-                    if buttons[0].is_clicked(mouse_pos, event):
-                        game = OthelloGame()
-                        game.game_mode = 0  # 対人モード
-                        menu_active = False
-                    
-                    # コンピュータ対戦 (初級)
-                    elif buttons[1].is_clicked(mouse_pos, event):
-                        game = OthelloGame()
-                        game.game_mode = 1  # コンピュータ対戦
-                        game.difficulty = 1  # 初級
-                        menu_active = False
-                    
-                    # コンピュータ対戦 (中級)
-                    elif buttons[2].is_clicked(mouse_pos, event):
-                        game = OthelloGame()
-                        game.game_mode = 1  # コンピュータ対戦
-                        game.difficulty = 2  # 中級
-                        menu_active = False
-                    
-                    # コンピュータ対戦 (上級)
-                    elif buttons[3].is_clicked(mouse_pos, event):
-                        game = OthelloGame()
-                        game.game_mode = 1  # コンピュータ対戦
-                        game.difficulty = 3  # 上級
-                        menu_active = False
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    button = menu_screen.hit_test(event.pos)
+                    if button is None:
+                        continue
                     
                     # 終了
-                    elif buttons[4].is_clicked(mouse_pos, event):
+                    if button.action is None:
+                        worker.shutdown()
+                        game.close()
                         pygame.quit()
                         sys.exit()
+                    
+                    # 対人モード / コンピュータ対戦 (難易度別)。前の対局の探索エンジンは終了する
+                    game.close()
+                    game = OthelloGame()
+                    game.game_mode, game.difficulty = button.action
+                    menu_active = False
+            
+            if menu_active:
+                # ホバーが変わったボタンだけを画面に反映する
+                pygame.display.update(menu_screen.update(screen, pygame.mouse.get_pos()))
+            # ゲーム画面に戻ったら盤面を全て描き直す
+            board_renderer.invalidate()
         
         else:
             # ゲーム画面
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    worker.shutdown()
+                    game.close()
                     pygame.quit()
                     sys.exit()
                 
@@ -439,28 +342,72 @@ def game_loop():
                             game.make_move(row, col)
                 
                 if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r and game.game_over:
-                        # リスタート
+                    if event.key == pygame.K_r and (game.game_over or worker.busy):
+                        # リスタート (コンピュータの思考中なら中断し、前の対局の探索エンジンは終了する)
+                        worker.cancel(wait=True)
+                        game.close()
+                        game_mode, difficulty = game.game_mode, game.difficulty
                         game = OthelloGame()
-                        game.game_mode = game.game_mode
-                        game.difficulty = game.difficulty
+                        game.game_mode = game_mode
+                        game.difficulty = difficulty
+                    elif event.key == pygame.K_i:
+                        show_stats = not show_stats
+                    elif event.key == pygame.K_s:
+                        # 対局中の局面を棋譜ファイルに保存する (コンピュータの種類は難易度で記録する)
+                        save_game(SAVE_PATH, game, 0, game.difficulty if game.game_mode == 1 else 0)
+                        message = "保存しました"
+                        message_until = pygame.time.get_ticks() + MESSAGE_MS
+                    elif event.key == pygame.K_l:
+                        # 保存した局面を読み込む (コンピュータの思考中なら中断する)
+                        try:
+                            loaded, record = load_game(SAVE_PATH)
+                        except (OSError, ValueError, IndexError):
+                            message = "読み込めません"
+                        else:
+                            worker.cancel(wait=True)
+                            game.close()
+                            game = loaded
+                            game.game_mode = 1 if record.white else 0
+                            game.difficulty = record.white or 1
+                            message = "読み込みました"
+                        message_until = pygame.time.get_ticks() + MESSAGE_MS
                     elif event.key == pygame.K_m:
-                        # メニューに戻る
+                        # メニューに戻る (コンピュータの思考中なら中断する。探索エンジンはメニューで次の対局を選んだときに終了する)
+                        worker.cancel(wait=True)
                         menu_active = True
+                        menu_screen.invalidate()
             
-            # コンピュータの手番
-            if game.game_mode == 1 and game.current_player == 2 and not game.game_over:
-                # 少し遅延を入れる
-                pygame.time.delay(500)
-                computer_move = game.get_computer_move()
+            # コンピュータの手番 (計算は別スレッドで行い、終わったら AI_DONE_EVENT で起こされる)
+            if not menu_active and is_computer_turn(game):
+                if not worker.busy:
+                    game.search_profile = show_stats
+                    worker.start(game)
+                computer_move = worker.poll()
                 if computer_move:
                     row, col = computer_move
                     game.make_move(row, col)
             
-            draw_board(game)
+            # 変わった部分だけを画面に反映する
+            if message is not None and pygame.time.get_ticks() >= message_until:
+                message = None
+            pygame.display.update(draw_board(game, thinking=worker.busy, stats=worker.last_stats,
+                                             show_stats=show_stats, message=message))
         
-        pygame.display.flip()
-        clock.tick(60)
+        # 次のフレームまで眠る (入力・タイマー・コンピュータの計算終了で起きる)
+        if menu_active or not (worker.busy or is_computer_turn(game)):
+            timeout = None
+        elif worker.busy:
+            # 「考え中...」の点を動かす時刻まで
+            timeout = THINKING_BLINK_MS - pygame.time.get_ticks() % THINKING_BLINK_MS
+        else:
+            # パスでもう一度コンピュータの手番になったのですぐに次の計算を始める
+            timeout = 0
+        if message is not None and not menu_active:
+            # 保存・読み込みの結果を消す時刻にも起きる
+            remaining = max(0, message_until - pygame.time.get_ticks())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        events = scheduler.wait(timeout)
 
 if __name__ == "__main__":
+    init_display()
     game_loop()
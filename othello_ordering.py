@@ -0,0 +1,168 @@
+"""探索の手の並べ替え (pygame非依存)
+
+αβ探索は良い手から先に読むほど枝刈りが効くので、次の順で手を並べる。
+  1. 置換表に記録された最善手
+  2. 同じ手数でβカットを起こしたキラー手 (2つまで)
+  3. 評価ボードのマスの重み
+  4. ヒストリー (βカットを起こした回数を深さで重み付けしたもの。重みが同じマスの間の順位に使う)
+末端に近いノードでは、代わりに相手の合法手が少なくなる順 (相手の着手可能数順) にもできる。
+
+python othello_ordering.py で並べ替えの有無による探索ノード数を比較できる。
+"""
+import time
+
+from othello_bitboard import BOARD_SIZE, get_moves, iter_squares, popcount
+from othello_eval import EVAL_BOARD
+
+# マス番号ごとの評価ボードの重み
+SQUARE_WEIGHTS = [EVAL_BOARD[square // BOARD_SIZE][square % BOARD_SIZE]
+                  for square in range(BOARD_SIZE * BOARD_SIZE)]
+
+# 探索する手数の上限 (パスを含めても盤面のマス数を超えない)
+MAX_PLY = BOARD_SIZE * BOARD_SIZE + 4
+
+# キラー手に与える点数 (重みやヒストリーより必ず大きくする)
+KILLER_BONUS = 1 << 48
+SECOND_KILLER_BONUS = 1 << 47
+# マスの重みに掛ける値 (ヒストリーより必ず大きくする)
+WEIGHT_SCALE = 1 << 31
+# ヒストリーの値がこれを超えたら全体を半分にする
+HISTORY_LIMIT = 1 << 30
+
+
+class MoveOrderer:
+    """手の並べ替え
+
+    killers / history / weights で各情報を使うかどうかを切り替える。
+    mobility_depth 以下の残り深さでは、相手の着手可能数が少ない順に並べる (0 で使わない)。
+    """
+
+    def __init__(self, killers=True, history=True, weights=True, mobility_depth=0):
+        self.use_killers = killers
+        self.use_history = history
+        self.use_weights = weights
+        self.mobility_depth = mobility_depth
+
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        # 手番 (1: 黒, 2: 白) ごとのマス番号別ヒストリー
+        self.history = [None, [0] * (BOARD_SIZE * BOARD_SIZE), [0] * (BOARD_SIZE * BOARD_SIZE)]
+
+    def new_search(self):
+        """探索ごとに呼ぶ。キラー手は消し、ヒストリーは古い分を半分にする"""
+        for slot in self.killers:
+            slot[0] = slot[1] = None
+        for table in self.history[1:]:
+            for square in range(len(table)):
+                table[square] >>= 1
+
+    def order(self, game, moves, hash_move, ply, depth):
+        """合法手のマスク moves を読む順に並べたマス番号のリストを返す"""
+        if hash_move is not None and moves >> hash_move & 1:
+            moves ^= 1 << hash_move
+        else:
+            hash_move = None
+
+        squares = list(iter_squares(moves))
+        if len(squares) > 1:
+            if depth <= self.mobility_depth:
+                squares.sort(key=self._mobility_keys(game, squares).__getitem__)
+            else:
+                squares.sort(key=self._scores(game.current_player, squares, ply).__getitem__,
+                             reverse=True)
+
+        if hash_move is not None:
+            squares.insert(0, hash_move)
+        return squares
+
+    def _scores(self, color, squares, ply):
+        scores = {}
+        history = self.history[color]
+        killer1, killer2 = self.killers[ply]
+        for square in squares:
+            score = SQUARE_WEIGHTS[square] * WEIGHT_SCALE if self.use_weights else 0
+            if self.use_history:
+                score += history[square]
+            if self.use_killers:
+                if square == killer1:
+                    score += KILLER_BONUS
+                elif square == killer2:
+                    score += SECOND_KILLER_BONUS
+            scores[square] = score
+        return scores
+
+    def _mobility_keys(self, game, squares):
+        # 打った後の相手の合法手の数 (少ない順), 同数ならマスの重みが大きい順
+        player, opponent = game.get_bitboards()
+        keys = {}
+        for square in squares:
+            flips = game.get_flips(square)
+            keys[square] = (popcount(get_moves(opponent ^ flips, player | flips | (1 << square))),
+                            -SQUARE_WEIGHTS[square])
+        return keys
+
+    def record_cutoff(self, color, square, ply, depth):
+        """square でβカットが起きたことを記録する"""
+        if self.use_killers:
+            slot = self.killers[ply]
+            if slot[0] != square:
+                slot[1] = slot[0]
+                slot[0] = square
+        if self.use_history:
+            table = self.history[color]
+            table[square] += depth * depth
+            if table[square] > HISTORY_LIMIT:
+                for other in self.history[1:]:
+                    for i in range(len(other)):
+                        other[i] >>= 1
+
+
+def root_order(squares):
+    """ルートの手を評価ボードの重みが大きい順に並べる (同じ重みならマス番号順)"""
+    return sorted(squares, key=lambda square: -SQUARE_WEIGHTS[square])
+
+
+def compare_orderings(depth=7, positions=20, seed=1):
+    """並べ替えの設定ごとに、同じ局面を同じ深さまで読んだときのノード数を比べる"""
+    import random
+
+    from othello_core import OthelloGame
+    from othello_search import SearchEngine
+
+    rng = random.Random(seed)
+    games = []
+    while len(games) < positions:
+        game = OthelloGame()
+        for _ in range(rng.randrange(4, 30)):
+            if game.game_over:
+                break
+            game.make_move(*rng.choice(game.valid_moves))
+        if not game.game_over:
+            games.append(game)
+
+    settings = [
+        ("hash move only", MoveOrderer(killers=False, history=False, weights=False)),
+        ("+ weights", MoveOrderer(killers=False, history=False)),
+        ("+ killers", MoveOrderer(history=False)),
+        ("+ history (default)", MoveOrderer()),
+        ("+ mobility (depth <= 2)", MoveOrderer(mobility_depth=2)),
+    ]
+    results = []
+    for name, orderer in settings:
+        nodes = 0
+        start = time.perf_counter()
+        for game in games:
+            engine = SearchEngine(max_depth=depth, tt_memory=1 << 22, orderer=orderer)
+            engine.search(game)
+            nodes += engine.nodes
+        results.append((name, nodes, time.perf_counter() - start))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    search_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    print(f"depth {search_depth}")
+    print(f"{'ordering':<26}{'nodes':>12}{'seconds':>10}")
+    for name, nodes, seconds in compare_orderings(search_depth):
+        print(f"{name:<26}{nodes:>12}{seconds:>10.2f}")
@@ -0,0 +1,463 @@
+"""複数プロセスでの並列αβ探索 (pygame非依存)
+
+1つのプロセスでは探索に CPU を1つしか使えないので、合法手をプロセスプールのワーカーに分けて読む。
+分け方は Young Brothers Wait (YBWC) で、
+  - 最初の手 (長男) を先に読んで α を決め、残りの手 (弟) をその α で並列に読む
+  - 長男を打った局面も split_plies 手目までは同じように分ける (深い分割)
+  - 弟の結果で α が上がったら共有メモリの値を書き換える。これから読み始める手は新しい α で読み、
+    α が β 以上になったら (βカット) 読んでいる途中の手も打ち切る
+ワーカーは探索エンジン (手の並べ替えの情報) をプロセスごとに持ち続け、探索をまたいで使い回す。
+置換表は既定では全ワーカーで1つの SharedTranspositionTable (共有メモリ) を使うので、
+あるワーカーが読んだ局面の結果を他のワーカーも使える (shared_tt=False ならワーカーごとの置換表)。
+
+同じ深さなら逐次の SearchEngine と同じ手を選ぶ。根の弟は α - 1 を下限として読むので
+最善と同じ評価値の手も正確な値になり、同じ評価値の手の中では逐次の探索が先に読む手を選ぶ。
+(逐次の探索と同じく、置換表に残った別の探索の結果によっては評価値がわずかに変わることがある。
+比べるときは clear() で置換表を消しておく)
+
+python othello_parallel.py [--depth D] [--workers 1 2 4] [--positions N] [--private-tt]
+で、無作為な局面について逐次の探索と手が一致するかを確かめ、ワーカー数ごとの速さと
+置換表のヒット率 (うち他のワーカーが書いたエントリの割合) を比べる。
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Value
+from multiprocessing.sharedctypes import RawValue
+
+from othello_bitboard import BOARD_SIZE, SQUARE_COORDS, iter_squares, popcount
+from othello_core import OthelloGame
+from othello_ordering import MoveOrderer, root_order
+from othello_search import INFINITY, SearchEngine, SearchTimeout
+from othello_tt import SharedTranspositionTable
+
+# 結果を待つ間に時間切れと中断を確認する間隔 (秒)
+POLL_INTERVAL = 0.005
+
+# ワーカーのプロセスごとの状態 (_init_worker で作る)
+_engine = None
+_game = None
+_bound = None
+_stop = None
+_epoch = None
+_search_id = None
+
+
+def _init_worker(bound, stop, tt_memory, evaluator, tt_name, writers):
+    global _engine, _game, _bound, _stop
+    tt = None
+    if tt_name is not None:
+        # 共有の置換表を開く (書いたプロセスの番号は1から順に振る。0は持ち主)
+        with writers.get_lock():
+            writers.value += 1
+            writer = writers.value
+        tt = SharedTranspositionTable(name=tt_name, writer=writer)
+    _engine = SearchEngine(tt_memory=tt_memory, evaluator=evaluator, tt=tt)
+    _game = OthelloGame()
+    _bound = bound
+    _stop = stop
+
+
+def _ping():
+    return os.getpid()
+
+
+class _Cancel:
+    """ワーカーの探索を打ち切るか (SearchEngine に stop_event として渡す)
+
+    全体の中断か、分けた局面の α (共有メモリ) が β 以上になったとき。
+    """
+
+    def __init__(self, beta):
+        self.beta = beta
+
+    def is_set(self):
+        return _stop.value or _bound.value >= self.beta
+
+
+def _search_task(epoch, search_id, black, white, player, square, depth, alpha, beta):
+    """ワーカーで1手読み、(評価値, ノード数, 置換表のヒット数, 置換表を引いた回数,
+    他のワーカーが書いたエントリへのヒット数) を返す
+
+    評価値は打つ側から見た値。打ち切った場合は None。
+    """
+    global _epoch, _search_id
+    engine = _engine
+    if epoch != _epoch:
+        engine.tt.clear()
+        engine.orderer = MoveOrderer()
+        _epoch = epoch
+    if search_id != _search_id:
+        engine.tt.new_search()
+        engine.orderer.new_search()
+        _search_id = search_id
+
+    # 他のワーカーの結果で上がった α を使う
+    alpha = max(alpha, _bound.value)
+    if alpha >= beta or _stop.value:
+        return None, 0, 0, 0, 0
+    _game.set_position(black, white, player)
+    tt = engine.tt
+    hits, misses, shared_hits = tt.hits, tt.misses, getattr(tt, "shared_hits", 0)
+    try:
+        score = engine.search_move(_game, square, depth, alpha, beta, _Cancel(beta))
+    except SearchTimeout:
+        score = None
+    hits = tt.hits - hits
+    return score, engine.nodes, hits, hits + tt.misses - misses, getattr(tt, "shared_hits", 0) - shared_hits
+
+
+class ParallelSearch:
+    """プロセスプールで並列に読む反復深化つきαβ探索 (SearchEngine と同じように使える)
+
+    workers はワーカーのプロセス数 (None なら CPU の数)。根と、split_plies 手目までの長男の局面で
+    手を分ける (0 なら根だけ)。残りの深さが min_split_depth 以下の長男は分けずに1つのワーカーで読む。
+    shared_tt が True なら全ワーカーで tt_memory バイトの共有の置換表を1つ使い、
+    False ならワーカーごとに tt_memory バイトの置換表を持つ。共有の置換表は close() で解放する。
+    evaluator はワーカーごとの SearchEngine に渡す (pickle できる関数)。
+    空きマスが endgame_empties 以下の局面はこのプロセスの終盤ソルバーで読み切る。
+    プールは最初の探索 (または start()) で作り、close() するまで使い回す。
+    """
+
+    def __init__(self, workers=None, max_depth=None, time_limit=None, tt_memory=16 * 1024 * 1024,
+                 endgame_empties=0, endgame_exact=True, evaluator=None, split_plies=1, min_split_depth=3,
+                 shared_tt=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.tt_memory = tt_memory
+        self.endgame_empties = endgame_empties
+        self.endgame_exact = endgame_exact
+        self.evaluator = evaluator
+        self.split_plies = split_plies
+        self.min_split_depth = min_split_depth
+        self.shared_tt = shared_tt
+        # 時間の内訳は測らない (SearchEngine と同じ属性を持たせるため)
+        self.profile = False
+
+        # 直前の探索結果
+        self.nodes = 0
+        self.best_score = 0
+        self.depth_reached = 0
+        self.last_stats = None
+
+        self._pool = None
+        self._table = None
+        self._bound = None
+        self._stop = None
+        self._epoch = 0
+        self._search_id = 0
+        self._serial = None
+        self._deadline = None
+        self._stop_event = None
+        self._iteration_best = None
+        self._tt_hits = 0
+        self._tt_probes = 0
+        self._tt_shared_hits = 0
+
+    def start(self):
+        """ワーカーのプロセスを起動しておく (最初の探索で自動的に呼ばれる)"""
+        if self._pool is not None:
+            return
+        # 分けた局面の現在の α と、全体の中断フラグ (書き込むのはこのプロセスだけ)
+        self._bound = RawValue("q", 0)
+        self._stop = RawValue("b", 0)
+        if self.shared_tt:
+            self._table = SharedTranspositionTable(self.tt_memory)
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                         initargs=(self._bound, self._stop, self.tt_memory, self.evaluator,
+                                                   None if self._table is None else self._table.name,
+                                                   Value("i", 0)))
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        """ワーカーのプロセスを終了し、共有の置換表を解放する"""
+        if self._pool is not None:
+            self._stop.value = 1
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clear(self):
+        """全ワーカーの置換表と手の並べ替えの情報を (次に手を読むときに) 消す"""
+        self._epoch += 1
+        if self._table is not None:
+            # 探索中でなければ読み書きしているワーカーはいない
+            self._table.clear()
+
+    def search(self, game, stop_event=None):
+        """game の手番側の最善手を (row, col) で返す。合法手がなければ None"""
+        if not game.moves:
+            return None
+
+        empties = BOARD_SIZE * BOARD_SIZE - popcount(game.black | game.white)
+        if empties <= self.endgame_empties:
+            return self._solve_endgame(game, stop_event)
+
+        self.start()
+        started = time.perf_counter()
+        self._deadline = None if self.time_limit is None else started + self.time_limit
+        self._stop_event = stop_event
+        self._stop.value = 0
+        self._search_id += 1
+        if self._table is not None:
+            self._table.new_search()
+        self.nodes = 0
+        self.depth_reached = 0
+        self._tt_hits = self._tt_probes = self._tt_shared_hits = 0
+        # 手を分ける局面へ進めるための複製
+        position = game.copy()
+        try:
+            move, iterations, timed_out = self._iterate(position, empties)
+        finally:
+            self._stop_event = None
+
+        seconds = time.perf_counter() - started
+        self.last_stats = {
+            "source": "parallel",
+            "move": list(move),
+            "score": self.best_score,
+            "depth": self.depth_reached,
+            "nodes": self.nodes,
+            "seconds": seconds,
+            "nps": self.nodes / seconds if seconds else 0.0,
+            "tt_hits": self._tt_hits,
+            "tt_probes": self._tt_probes,
+            "tt_hit_rate": self._tt_hits / self._tt_probes if self._tt_probes else 0.0,
+            # ヒットのうち、別のワーカーが書いたエントリの割合 (共有の置換表のとき)
+            "tt_shared_hits": self._tt_shared_hits,
+            "tt_cross_hit_rate": self._tt_shared_hits / self._tt_hits if self._tt_hits else 0.0,
+            "branching_factor": None,
+            "iterations": iterations,
+            "timed_out": timed_out,
+            # 最善応手手順はワーカーの置換表にあるので、最初の手だけ
+            "pv": [list(move)],
+            "times": None,
+            "workers": self.workers,
+        }
+        return move
+
+    def _solve_endgame(self, game, stop_event):
+        if self._serial is None:
+            self._serial = SearchEngine(tt_memory=1024)
+        serial = self._serial
+        serial.endgame_empties = self.endgame_empties
+        serial.endgame_exact = self.endgame_exact
+        move = serial.search(game, stop_event)
+        self.nodes = serial.nodes
+        self.best_score = serial.best_score
+        self.depth_reached = serial.depth_reached
+        self.last_stats = serial.last_stats
+        return move
+
+    def _iterate(self, game, empties):
+        # SearchEngine._iterate と同じ反復深化 (根の手の順も同じにする)
+        max_depth = empties if self.max_depth is None else min(self.max_depth, empties)
+
+        root_moves = root_order(iter_squares(game.moves))
+        best_move = root_moves[0]
+        self.best_score = 0
+        iterations = []
+        timed_out = False
+        started = time.perf_counter()
+
+        for depth in range(1, max(max_depth, 1) + 1):
+            self._iteration_best = None
+            nodes_before = self.nodes
+            try:
+                score, move = self._split(game, root_moves, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                if self._iteration_best is not None:
+                    best_move, self.best_score = self._iteration_best
+                timed_out = True
+                break
+
+            best_move = move
+            self.best_score = score
+            self.depth_reached = depth
+            iterations.append({"depth": depth, "nodes": self.nodes - nodes_before,
+                               "seconds": time.perf_counter() - started,
+                               "move": list(SQUARE_COORDS[move]), "score": score})
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+
+        return SQUARE_COORDS[best_move], iterations, timed_out
+
+    def _split(self, game, moves, depth, alpha, beta, level):
+        """game の手番側の手 moves (読む順) を深さ depth で読み、(評価値, 最善手) を返す (level 0 が根)"""
+        mover = game.current_player
+        root = level == 0
+        order = {square: index for index, square in enumerate(moves)}
+
+        # 長男
+        first = moves[0]
+        game.push_square(first)
+        try:
+            deeper = level < self.split_plies and depth - 1 > self.min_split_depth and not game.game_over
+            if deeper:
+                child_moves = root_order(iter_squares(game.moves))
+                if game.current_player == mover:
+                    score = self._split(game, child_moves, depth - 1, alpha, beta, level + 1)[0]
+                else:
+                    score = -self._split(game, child_moves, depth - 1, -beta, -alpha, level + 1)[0]
+        finally:
+            game.pop()
+        if not deeper:
+            results = []
+            self._run_tasks(game, [first], depth, alpha, beta, lambda square, score: results.append(score))
+            score = results[0]
+
+        best = [score, first]
+        if root:
+            self._iteration_best = (first, score)
+        alpha = max(alpha, score)
+        if alpha >= beta or len(moves) == 1:
+            return best
+
+        # 弟 (根では同じ評価値の手も正確な値になるように α - 1 を下限にする)
+        window = [alpha]
+
+        def update(square, score):
+            if score is None:
+                return False
+            if score > best[0] or (root and score == best[0] and order[square] < order[best[1]]):
+                best[:] = score, square
+                if root:
+                    self._iteration_best = (square, score)
+                if score > window[0]:
+                    window[0] = score
+                    self._bound.value = score - 1 if root else score
+            # βカットなら残りの手は読まない
+            return window[0] >= beta
+
+        bound = alpha - 1 if root else alpha
+        self._run_tasks(game, moves[1:], depth, bound, beta, update)
+        return best
+
+    def _run_tasks(self, game, squares, depth, alpha, beta, on_result):
+        # squares をワーカーで読み、終わった順に on_result(square, 評価値) を呼ぶ
+        # (on_result が True を返したら残りは打ち切る)。戻る前に全てのワーカーが手を読み終える
+        args = (self._epoch, self._search_id, game.black, game.white, game.current_player)
+        self._bound.value = alpha
+        futures = {self._pool.submit(_search_task, *args, square, depth, alpha, beta): square
+                   for square in squares}
+        pending = set(futures)
+        try:
+            while pending:
+                self._check_time()
+                done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    score, nodes, hits, probes, shared_hits = future.result()
+                    self.nodes += nodes
+                    self._tt_hits += hits
+                    self._tt_probes += probes
+                    self._tt_shared_hits += shared_hits
+                    if on_result(futures[future], score):
+                        # 共有の α が β 以上になっているので、読んでいる途中のワーカーも打ち切られる
+                        return
+        finally:
+            for future in pending:
+                future.cancel()
+            # 打ち切ったワーカーが戻るまで待つ (共有メモリの α を次の局面で使うため)
+            for future in wait(pending)[0]:
+                if not future.cancelled():
+                    self.nodes += future.result()[1]
+
+    def _check_time(self):
+        if ((self._deadline is not None and time.perf_counter() > self._deadline)
+                or (self._stop_event is not None and self._stop_event.is_set())):
+            self._stop.value = 1
+            raise SearchTimeout()
+
+
+def random_positions(count, seed=0):
+    """無作為に12〜40手打ち進めた、手番側に合法手がある OthelloGame のリストを返す"""
+    import random
+
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = OthelloGame()
+        for _ in range(rng.randrange(12, 41)):
+            if game.game_over:
+                break
+            game.make_move(*rng.choice(game.valid_moves))
+        if not game.game_over:
+            games.append(game)
+    return games
+
+
+def compare(games, depth, worker_counts, split_plies=1, shared_tt=True):
+    """逐次の探索とワーカー数ごとの並列探索で games を深さ depth で読み比べる
+
+    {"serial": (秒, ノード数, 置換表のヒット率),
+     ワーカー数: (秒, ノード数, 置換表のヒット率, 逐次と手が一致した局面数, 他のワーカーが書いたエントリへのヒットの割合)}
+    を返す。局面ごとに置換表を消してから読む。
+    """
+    results = {}
+    serial_moves = []
+    seconds = nodes = hits = probes = 0
+    for game in games:
+        engine = SearchEngine(max_depth=depth)
+        start = time.perf_counter()
+        serial_moves.append(engine.search(game))
+        seconds += time.perf_counter() - start
+        nodes += engine.nodes
+        hits += engine.last_stats["tt_hits"]
+        probes += engine.last_stats["tt_probes"]
+    results["serial"] = (seconds, nodes, hits / probes if probes else 0.0)
+
+    for workers in worker_counts:
+        with ParallelSearch(workers, max_depth=depth, split_plies=split_plies, shared_tt=shared_tt) as search:
+            search.start()
+            seconds = nodes = agree = hits = probes = shared_hits = 0
+            for game, expected in zip(games, serial_moves):
+                search.clear()
+                start = time.perf_counter()
+                move = search.search(game)
+                seconds += time.perf_counter() - start
+                nodes += search.nodes
+                agree += move == expected
+                hits += search.last_stats["tt_hits"]
+                probes += search.last_stats["tt_probes"]
+                shared_hits += search.last_stats["tt_shared_hits"]
+        results[workers] = (seconds, nodes, hits / probes if probes else 0.0, agree,
+                            shared_hits / hits if hits else 0.0)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="並列探索と逐次の探索の比較")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--split-plies", type=int, default=1, help="手を分ける深さ (0 なら根だけ)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--private-tt", action="store_true", help="共有の置換表を使わずワーカーごとに持つ")
+    args = parser.parse_args()
+
+    games = random_positions(args.positions, args.seed)
+    results = compare(games, args.depth, args.workers, args.split_plies, not args.private_tt)
+    serial_seconds, serial_nodes, serial_hit_rate = results.pop("serial")
+    print(f"{len(games)} positions, depth {args.depth}, {os.cpu_count()} CPUs,"
+          f" {'private' if args.private_tt else 'shared'} transposition tables")
+    print(f"{'':<10}{'seconds':>10}{'nodes':>12}{'speedup':>9}{'TT hit':>8}{'cross':>8}{'same move':>11}")
+    print(f"{'serial':<10}{serial_seconds:>10.2f}{serial_nodes:>12}{1:>9.2f}{serial_hit_rate:>8.1%}")
+    mismatches = 0
+    for workers, (seconds, nodes, hit_rate, agree, cross_rate) in results.items():
+        print(f"{f'{workers} workers':<10}{seconds:>10.2f}{nodes:>12}{serial_seconds / seconds:>9.2f}"
+              f"{hit_rate:>8.1%}{cross_rate:>8.1%}{f'{agree}/{len(games)}':>11}")
+        mismatches += len(games) - agree
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,450 @@
+"""パターンによる局面の評価 (pygame非依存)
+
+評価ボード (othello_eval) はマスごとの固定の重みしか見ないので、X打ち・C打ちが角の有無で
+良くも悪くもなることや、角から続く辺の石が確定石になることを評価できない。
+ここでは盤面をいくつかのパターン (辺・角の3x3・角の2x5・対角線) に分け、パターンごとの石の並び
+(空: 0, 黒: 1, 白: 2 の3進数の番号) から表を引いて評価値を足し合わせる。
+
+- パターンは8通りの対称変換で重なるものをまとめ、同じ形のパターンは同じ表を使う
+- 表は石数による局面の段階 (PHASE_DISCS) ごとに分ける
+- パターンの番号は局面ごとに最初から計算せず、着手の差分 (打ったマスと裏返した石) で更新する。
+  OthelloGame の history を手数ごとに覚えておき、前に評価した局面との共通の手数から先だけを足す
+- パターンのほかに、段階ごとの重みで石数の差と、合法手の数・潜在的な合法手の数・開放度の差
+  (SCALAR_FEATURES) を足す。合法手の数などは評価する局面のビットボードから求める (othello_eval.mobility_features)
+- 表は othello_train で対局から学習した重みファイル (同梱の pattern_weights.bin) から読む。
+  重みファイルがなければ build_tables で規則から作った表を使う (合法手の数などは使わない)。
+  NumPy は表を作るときと重みファイルを書くときだけ使うので、重みファイルがあれば評価には要らない
+
+SearchEngine(evaluator=PatternEvaluator()) のように探索の評価関数として使う。
+
+重みファイルの形式 (リトルエンディアン):
+    ヘッダ: マジック "OTPW", バージョン(u16), 段階の数(u16), パターンの数(u16)
+    段階ごとに: SCALAR_FEATURES の順の重み (i16), PATTERN_NAMES の順にパターンの表 (3 ** マス数 個の i16)
+    (バージョン1のファイルは SCALAR_FEATURES のうち石数の差の重みだけを持つ)
+ファイルは mmap で開き、表は読み込まずにそのまま引く。
+
+python othello_pattern.py bench       評価の速さを評価ボードと比べる
+python othello_pattern.py match [局数] [深さ]   評価ボードと対局させる
+"""
+import mmap
+import operator
+import os
+import struct
+import sys
+from array import array
+
+from othello_bitboard import BOARD_SIZE, popcount
+from othello_book import to_canonical_square
+from othello_eval import EVAL_BOARD, evaluate as evaluate_squares, mobility_features
+
+SQUARES = BOARD_SIZE * BOARD_SIZE
+
+# パターン (名前, 基準の向きのマス (row, col) のリスト)。基準の向きでは左上の角から並べる
+PATTERNS = (
+    ("edge", [(0, col) for col in range(BOARD_SIZE)]),
+    ("corner", [(row, col) for row in range(3) for col in range(3)]),
+    ("block", [(row, col) for row in range(2) for col in range(5)]),
+    ("diagonal", [(i, i) for i in range(BOARD_SIZE)]),
+)
+PATTERN_NAMES = tuple(name for name, _ in PATTERNS)
+
+# パターンのほかに段階ごとの重みを掛けて足す値 (どれも黒から見た差):
+# 石数, 合法手の数, 潜在的な合法手の数 (相手の石と隣り合う空きマス), 開放度 (空きマスと隣り合う自分の石)
+SCALAR_FEATURES = ("discs", "mobility", "potential", "frontier")
+
+# 局面の段階の境目 (盤上の石数がこの値以上なら次の段階)
+PHASE_DISCS = (20, 36, 50)
+PHASE_COUNT = len(PHASE_DISCS) + 1
+# 石数ごとの段階
+PHASE_OF_DISCS = [sum(discs >= limit for limit in PHASE_DISCS) for discs in range(SQUARES + 1)]
+
+# build_tables で使う段階ごとのパターンの倍率と、石数の差の重み
+PHASE_SCALES = (
+    {"edge": 1.0, "corner": 1.0, "block": 1.0, "diagonal": 1.0, "discs": -1},
+    {"edge": 1.0, "corner": 1.0, "block": 1.0, "diagonal": 1.0, "discs": 0},
+    {"edge": 1.2, "corner": 1.0, "block": 0.8, "diagonal": 0.8, "discs": 1},
+    {"edge": 1.0, "corner": 0.8, "block": 0.5, "diagonal": 0.5, "discs": 4},
+)
+
+
+def _build_instances():
+    # 対称変換で重ならないパターンの置き場所 [(名前, マス番号のリスト)]
+    instances = []
+    for name, coords in PATTERNS:
+        seen = set()
+        for symmetry in range(8):
+            squares = [to_canonical_square(row * BOARD_SIZE + col, symmetry) for row, col in coords]
+            if frozenset(squares) not in seen:
+                seen.add(frozenset(squares))
+                instances.append((name, squares))
+    return tuple(instances)
+
+
+INSTANCES = _build_instances()
+
+# マス番号ごとに [(置き場所の番号, 3のべき乗)] (そのマスを含むパターンと、そのマスの桁)
+SQUARE_DIGITS = [[(index, 3 ** position)
+                  for index, (_, squares) in enumerate(INSTANCES)
+                  for position, square in enumerate(squares) if square == target]
+                 for target in range(SQUARES)]
+
+# [打った側][マス番号] -> そのマスに石を置いたとき・そのマスの石が裏返ったときの ((置き場所の番号, 番号の増分), ...)
+# (空 0 -> 黒 1 / 白 2, 白 2 -> 黒 1 は -1 桁, 黒 1 -> 白 2 は +1 桁)
+PLACE_DELTAS = [None] + [[tuple((index, mover * power) for index, power in digits) for digits in SQUARE_DIGITS]
+                         for mover in (1, 2)]
+FLIP_DELTAS = [None] + [[tuple((index, (2 * mover - 3) * power) for index, power in digits)
+                         for digits in SQUARE_DIGITS] for mover in (1, 2)]
+
+
+def pattern_indices(black, white):
+    """黒・白のビットボードから、置き場所ごとのパターンの番号のリストを最初から計算する"""
+    indices = []
+    for _, squares in INSTANCES:
+        index = 0
+        for square in reversed(squares):
+            index = index * 3 + (1 if black >> square & 1 else 2 if white >> square & 1 else 0)
+        indices.append(index)
+    return indices
+
+
+def _digits(length):
+    # 3 ** length 通りの並びを (並びの番号, 桁) の配列にする (桁0が最下位)
+    import numpy as np
+
+    numbers = np.arange(3 ** length)
+    return np.stack([numbers // 3 ** position % 3 for position in range(length)], axis=1)
+
+
+def _runs_from(cells, start, step, length):
+    # start のマスから step ずつ進んで、start と同じ色の石が続いているマス (空でない) を True にする
+    import numpy as np
+
+    color = cells[:, start]
+    result = np.zeros(cells.shape, dtype=bool)
+    alive = color != 0
+    for position in range(start, start + step * length, step):
+        alive &= cells[:, position] == color
+        result[:, position] = alive
+    return result
+
+
+def build_tables():
+    """規則から作った表 (黒から見た値) を {パターンの名前: (3 ** マス数,) の float 配列} で返す
+
+    角: 角の石 (+100)、角が空いているときの X の石 (-80)、内側の石 (-1)
+    辺: 角から同じ色が続く石と、空きのない辺の石は確定石 (+30)。それ以外は C (角が空いているとき -40)
+        と A・B (評価ボードの重み)
+    2x5: 2行目の石の上の辺が空いていると、相手に辺を取らせる (-15)
+    対角線: 角から同じ色が続く石 (+5)
+    (値は評価ボードとの対局で調整した)
+    """
+    # NumPy は表を作るときだけ使う (重みファイルを読んで評価するだけなら import しない)
+    import numpy as np
+
+    tables = {}
+
+    cells = _digits(9)
+    sign = (cells == 1).astype(int) - (cells == 2)
+    corner_empty = cells[:, 0] == 0
+    tables["corner"] = (100 * sign[:, 0] - 80 * sign[:, 4] * corner_empty
+                        - sign[:, 5] - sign[:, 7] - sign[:, 8])
+
+    cells = _digits(BOARD_SIZE)
+    sign = (cells == 1).astype(int) - (cells == 2)
+    stable = _runs_from(cells, 0, 1, BOARD_SIZE) | _runs_from(cells, BOARD_SIZE - 1, -1, BOARD_SIZE)
+    stable |= (cells != 0).all(axis=1)[:, None]
+    weights = np.array(EVAL_BOARD[0])
+    value = np.zeros(len(cells), dtype=int)
+    for position in range(1, BOARD_SIZE - 1):
+        loose = weights[position]
+        if position in (1, BOARD_SIZE - 2):
+            corner = 0 if position == 1 else BOARD_SIZE - 1
+            loose = np.where(cells[:, corner] == 0, -40, 0)
+        value += sign[:, position] * np.where(stable[:, position], 30, loose)
+    tables["edge"] = value
+
+    cells = _digits(10)
+    sign = (cells == 1).astype(int) - (cells == 2)
+    value = np.zeros(len(cells), dtype=int)
+    for col in range(2, 5):
+        value -= 15 * sign[:, 5 + col] * (cells[:, col] == 0)
+    tables["block"] = value
+
+    cells = _digits(BOARD_SIZE)
+    sign = (cells == 1).astype(int) - (cells == 2)
+    stable = _runs_from(cells, 0, 1, BOARD_SIZE) | _runs_from(cells, BOARD_SIZE - 1, -1, BOARD_SIZE)
+    stable[:, [0, BOARD_SIZE - 1]] = False
+    tables["diagonal"] = 5 * (sign * stable).sum(axis=1)
+    return tables
+
+
+# 同梱の学習済みの重み
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_weights.bin")
+
+WEIGHTS_MAGIC = b"OTPW"
+WEIGHTS_VERSION = 2
+WEIGHTS_HEADER = struct.Struct("<4sHHH")
+# 表のマス数 (PATTERN_NAMES の順)
+PATTERN_LENGTHS = tuple(len(coords) for _, coords in PATTERNS)
+
+
+def write_weights(path, weights):
+    """重み (default_weights() と同じ形。表は list か配列) を重みファイルに書き、ファイルの大きさを返す
+
+    値は整数に丸め、i16 の範囲に収める。
+    """
+    import numpy as np
+
+    with open(path, "wb") as f:
+        f.write(WEIGHTS_HEADER.pack(WEIGHTS_MAGIC, WEIGHTS_VERSION, len(weights), len(PATTERN_NAMES)))
+        for phase in weights:
+            values = [np.array([phase.get(name, 0) for name in SCALAR_FEATURES], dtype=float)]
+            values += [np.asarray(phase[name], dtype=float) for name in PATTERN_NAMES]
+            f.write(np.clip(np.rint(np.concatenate(values)), -32768, 32767).astype("<i2").tobytes())
+        return f.tell()
+
+
+def load_weights(path):
+    """重みファイルを mmap で開き、default_weights() と同じ形の重みを返す (表は mmap を指す memoryview)"""
+    with open(path, "rb") as f:
+        # 空のファイルは mmap できず、ヘッダより短いファイルはヘッダを読めない
+        if os.fstat(f.fileno()).st_size < WEIGHTS_HEADER.size:
+            raise ValueError(f"重みファイルの形式が正しくありません: {path}")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, phases, patterns = WEIGHTS_HEADER.unpack_from(data, 0)
+    scalars = SCALAR_FEATURES if version == WEIGHTS_VERSION else SCALAR_FEATURES[:1]
+    size = WEIGHTS_HEADER.size + phases * 2 * (len(scalars) + sum(3 ** length for length in PATTERN_LENGTHS))
+    if (magic != WEIGHTS_MAGIC or version not in (1, WEIGHTS_VERSION) or phases != PHASE_COUNT
+            or patterns != len(PATTERN_NAMES) or len(data) != size):
+        data.close()
+        raise ValueError(f"重みファイルの形式が正しくありません: {path}")
+
+    values = memoryview(data)[WEIGHTS_HEADER.size:].cast("h")
+    if sys.byteorder != "little":
+        # ビッグエンディアンの環境では並べ替えた複製を使う
+        values = array("h", values.tobytes())
+        values.byteswap()
+    weights = []
+    offset = 0
+    for _ in range(phases):
+        phase = dict(zip(scalars, values[offset:offset + len(scalars)]))
+        offset += len(scalars)
+        for name, length in zip(PATTERN_NAMES, PATTERN_LENGTHS):
+            phase[name] = values[offset:offset + 3 ** length]
+            offset += 3 ** length
+        weights.append(phase)
+    return weights
+
+
+def default_weights():
+    """build_tables の表に段階ごとの倍率を掛けた重み
+
+    [段階] -> {パターンの名前: 整数の表 (list), "discs": 石数の差の重み} (合法手の数などの重みは持たない)
+    """
+    import numpy as np
+
+    tables = build_tables()
+    weights = []
+    for scales in PHASE_SCALES:
+        phase = {name: np.rint(tables[name] * scales[name]).astype(int).tolist() for name in PATTERN_NAMES}
+        phase["discs"] = scales["discs"]
+        weights.append(phase)
+    return weights
+
+
+_getitem = operator.getitem
+
+
+class PatternEvaluator:
+    """パターンの表による評価関数 (game を受け取り、手番側から見た評価値を返す)
+
+    weights は default_weights() と同じ形 (段階ごとに、パターンの名前 -> 表, SCALAR_FEATURES の名前 -> 重み。
+    ない重みは0) か、重みファイルのパス (load_weights で開く)。
+    None なら同梱の重みファイル、なければ規則から作った表を使う。
+    評価した局面の手数ごとのパターンの番号を覚えておき、次の局面では history の差分だけを足す。
+    """
+
+    def __init__(self, weights=None):
+        # 並列探索のワーカーに送るもの (既定の重みなら None, 重みファイルならパス)
+        self._source = weights
+        if weights is None:
+            weights = DEFAULT_WEIGHTS_PATH if os.path.exists(DEFAULT_WEIGHTS_PATH) else default_weights()
+        if isinstance(weights, str):
+            weights = load_weights(weights)
+        self.weights = weights
+        # 段階ごとに、置き場所の順に並べた表
+        self._tables = [[phase[name] for name, _ in INSTANCES] for phase in self.weights]
+        self._disc_weights = [phase["discs"] for phase in self.weights]
+        # 段階ごとの (合法手の数, 潜在的な合法手の数, 開放度) の差の重み。どれも0なら求めない
+        self._feature_weights = [tuple(phase.get(name, 0) for name in SCALAR_FEATURES[1:])
+                                 for phase in self.weights]
+        self._uses_features = any(any(weights) for weights in self._feature_weights)
+        # 評価した手順の手数ごとの (手数, その局面のキー, パターンの番号)
+        self._levels = []
+
+    def __getstate__(self):
+        # 並列探索のワーカーに渡すときは重みだけを送る (既定の重みと重みファイルはワーカーで作り直す)
+        return {"weights": self._source}
+
+    def __setstate__(self, state):
+        self.__init__(state["weights"])
+
+    def indices(self, game):
+        """game のパターンの番号のリスト (前に評価した局面からの差分で求める)"""
+        history = game.history
+        length = len(history)
+        levels = self._levels
+        # 今の手順と食い違っている手数を捨てる (キーが同じなら盤面も同じ)
+        while levels:
+            level_length, key, _ = levels[-1]
+            if level_length <= length and key == (history[level_length][5] if level_length < length else game.key):
+                break
+            levels.pop()
+        if not levels:
+            # 手順の最初の局面に戻した盤面から作り直す (以後は共通の手数から差分で求まる)
+            black, white = game.black, game.white
+            for square, flips, mover, *_ in reversed(history):
+                if mover == 1:
+                    black ^= flips | 1 << square
+                    white ^= flips
+                else:
+                    white ^= flips | 1 << square
+                    black ^= flips
+            levels.append((0, history[0][5] if history else game.key, pattern_indices(black, white)))
+
+        level_length, _, indices = levels[-1]
+        for position in range(level_length, length):
+            entry = history[position]
+            mover = entry[2]
+            flips = entry[1]
+            indices = indices[:]
+            for index, delta in PLACE_DELTAS[mover][entry[0]]:
+                indices[index] += delta
+            flip_deltas = FLIP_DELTAS[mover]
+            while flips:
+                low = flips & -flips
+                for index, delta in flip_deltas[low.bit_length() - 1]:
+                    indices[index] += delta
+                flips ^= low
+            key = history[position + 1][5] if position + 1 < length else game.key
+            levels.append((position + 1, key, indices))
+        return indices
+
+    def __call__(self, game):
+        indices = self.indices(game)
+        black_discs = popcount(game.black)
+        white_discs = popcount(game.white)
+        phase = PHASE_OF_DISCS[black_discs + white_discs]
+        score = (sum(map(_getitem, self._tables[phase], indices))
+                 + self._disc_weights[phase] * (black_discs - white_discs))
+        if self._uses_features:
+            mobility, potential, frontier = mobility_features(game)
+            mobility_weight, potential_weight, frontier_weight = self._feature_weights[phase]
+            score += mobility_weight * mobility + potential_weight * potential + frontier_weight * frontier
+        return score if game.current_player == 1 else -score
+
+    def evaluate_scratch(self, game):
+        """パターンの番号を差分で更新せずに評価する (確認用)"""
+        indices = pattern_indices(game.black, game.white)
+        black_discs = popcount(game.black)
+        white_discs = popcount(game.white)
+        phase = PHASE_OF_DISCS[black_discs + white_discs]
+        score = (sum(map(_getitem, self._tables[phase], indices))
+                 + self._disc_weights[phase] * (black_discs - white_discs))
+        if self._uses_features:
+            score += sum(map(operator.mul, self._feature_weights[phase], mobility_features(game)))
+        return score if game.current_player == 1 else -score
+
+
+def play_match(first, second, games=40, depth=3, seed=0, time_limit=None):
+    """評価関数 first と second を対局させ、(first の勝ち, 負け, 引き分け, first の石差の合計) を返す
+
+    無作為に6手打った局面から、先後を入れ替えて2局ずつ打つ。どちらも同じ深さ (または時間) の探索で打つ。
+    """
+    import random
+
+    from othello_core import OthelloGame
+    from othello_search import SearchEngine
+
+    rng = random.Random(seed)
+    wins = losses = draws = margin = 0
+    for index in range(games):
+        if index % 2 == 0:
+            opening = []
+            game = OthelloGame()
+            for _ in range(6):
+                move = rng.choice(game.valid_moves)
+                opening.append(move)
+                game.make_move(*move)
+        # 偶数局は first が黒、奇数局は first が白
+        first_color = 1 if index % 2 == 0 else 2
+        engines = {}
+        for color, evaluator in ((first_color, first), (3 - first_color, second)):
+            engines[color] = SearchEngine(max_depth=depth, time_limit=time_limit, evaluator=evaluator,
+                                          tt_memory=1024 * 1024)
+        game = OthelloGame()
+        for move in opening:
+            game.make_move(*move)
+        while not game.game_over:
+            game.make_move(*engines[game.current_player].search(game))
+        black, white = game.count_discs()
+        diff = (black - white) if first_color == 1 else (white - black)
+        margin += diff
+        if diff > 0:
+            wins += 1
+        elif diff < 0:
+            losses += 1
+        else:
+            draws += 1
+    return wins, losses, draws, margin
+
+
+def benchmark(games, depth=5):
+    """評価ボードとパターンで games を深さ depth で読み、
+    {名前: (評価の回数, 評価にかかった秒, 探索にかかった秒)} を返す"""
+    import time
+
+    from othello_search import SearchEngine
+
+    results = {}
+    for name, evaluator in (("squares", evaluate_squares), ("pattern", PatternEvaluator())):
+        counts = [0, 0.0]
+
+        def timed(game, evaluator=evaluator, counts=counts):
+            start = time.perf_counter()
+            score = evaluator(game)
+            counts[1] += time.perf_counter() - start
+            counts[0] += 1
+            return score
+
+        engine = SearchEngine(max_depth=depth, evaluator=timed)
+        start = time.perf_counter()
+        for game in games:
+            engine.search(game)
+        results[name] = (counts[0], counts[1], time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    import time
+
+    from othello_batch import random_games
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "bench":
+        games = [game for game in random_games(2000) if not game.game_over]
+        evaluator = PatternEvaluator()
+        mismatches = sum(evaluator(game) != evaluator.evaluate_scratch(game) for game in games)
+        print(f"{len(games)} positions, {mismatches} differences between incremental and scratch evaluation")
+        print(f"{'':<10}{'evals':>10}{'us/eval':>10}{'search s':>10}")
+        for name, (calls, seconds, total) in benchmark(games[:30]).items():
+            print(f"{name:<10}{calls:>10}{seconds / calls * 1e6:>10.2f}{total:>10.2f}")
+    elif command == "match":
+        games = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+        depth = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+        start = time.perf_counter()
+        wins, losses, draws, margin = play_match(PatternEvaluator(), evaluate_squares, games, depth)
+        print(f"pattern vs squares (depth {depth}): {wins} wins, {losses} losses, {draws} draws,"
+              f" disc margin {margin / games:+.1f} per game ({time.perf_counter() - start:.0f} s)")
+    else:
+        print(__doc__)
@@ -0,0 +1,129 @@
+"""perft: 指定した手数先までの局面数を数える (着手生成の正しさと速さの確認用, pygame非依存)
+
+OthelloGame の合法手・push/pop・パスと終局の判定を使って、
+depth 手先までに到達する末端の局面を数える。数え方は一般的なオセロのperftと同じで、
+  - パスも1手と数える
+  - 途中で終局した局面は、残りの手数にかかわらず末端の局面1つと数える
+初期局面からの値は公表されている値 (REFERENCE_COUNTS) と一致しなければならない。
+
+python othello_perft.py [深さ] で初期局面から1手ずつ深さを増やして数え、時間とノード数/秒を表示する。
+  --check           REFERENCE_COUNTS と比べ、一致しなければ終了コード1で終わる
+  --divide          最初の手ごとの内訳を表示する
+  --position 局面   64文字 (X: 黒, O: 白, -: 空, 行優先) と手番 (X または O) から数える
+  --bulk            最後の1手は打たずに合法手の数を数える (着手の確認にはならないが速い)
+"""
+import time
+
+from othello_bitboard import BOARD_SIZE, SQUARE_COORDS, iter_squares, popcount
+from othello_core import OthelloGame
+
+# 初期局面からの局面数 (深さ1から)
+REFERENCE_COUNTS = [4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284]
+
+
+def perft(game, depth, bulk=False):
+    """game から depth 手先までの末端の局面数を返す (game は元の局面に戻す)"""
+    if depth == 0 or game.game_over:
+        return 1
+    if bulk and depth == 1:
+        return popcount(game.moves)
+
+    nodes = 0
+    mover = game.current_player
+    for square in iter_squares(game.moves):
+        game.push_square(square)
+        nodes += _count_after_move(game, mover, depth, bulk)
+        game.pop()
+    return nodes
+
+
+def _count_after_move(game, mover, depth, bulk):
+    # mover が打った直後の局面から、残り depth - 1 手分を数える
+    if depth == 1:
+        return 1
+    if game.current_player == mover and not game.game_over:
+        # 相手がパスした (パスで1手使う)
+        return perft(game, depth - 2, bulk)
+    return perft(game, depth - 1, bulk)
+
+
+def divide(game, depth, bulk=False):
+    """最初の手ごとの局面数を [((row, col), 局面数)] で返す"""
+    result = []
+    mover = game.current_player
+    for square in iter_squares(game.moves):
+        game.push_square(square)
+        result.append((SQUARE_COORDS[square], _count_after_move(game, mover, depth, bulk)))
+        game.pop()
+    return result
+
+
+def parse_position(text, to_move="X"):
+    """64文字の盤面 (X: 黒, O: 白, -: 空) と手番から OthelloGame を作る"""
+    cells = "".join(text.split())
+    if len(cells) != BOARD_SIZE * BOARD_SIZE:
+        raise ValueError(f"盤面は64文字で指定してください ({len(cells)}文字)")
+    black = 0
+    white = 0
+    for square, cell in enumerate(cells.upper()):
+        if cell == "X":
+            black |= 1 << square
+        elif cell == "O":
+            white |= 1 << square
+        elif cell not in "-.":
+            raise ValueError(f"盤面に使えない文字です: {cell}")
+    game = OthelloGame()
+    game.set_position(black, white, 1 if to_move.upper() == "X" else 2)
+    return game
+
+
+def run(game, max_depth, bulk=False, reference=None):
+    """深さ1から max_depth まで数え、(深さ, 局面数, 秒) を順に返す
+
+    reference が指定されていれば、値が一致しなかった深さで AssertionError を送出する。
+    """
+    for depth in range(1, max_depth + 1):
+        start = time.perf_counter()
+        nodes = perft(game, depth, bulk)
+        seconds = time.perf_counter() - start
+        if reference is not None and depth <= len(reference) and nodes != reference[depth - 1]:
+            raise AssertionError(f"depth {depth}: {nodes} (expected {reference[depth - 1]})")
+        yield depth, nodes, seconds
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="perft (局面数の数え上げ)")
+    parser.add_argument("depth", type=int, nargs="?", default=8)
+    parser.add_argument("--check", action="store_true", help="初期局面の公表値と比べる")
+    parser.add_argument("--divide", action="store_true", help="最初の手ごとの内訳を表示する")
+    parser.add_argument("--position", nargs=2, metavar=("BOARD", "TO_MOVE"),
+                        help="64文字の盤面 (X/O/-) と手番 (X/O)")
+    parser.add_argument("--bulk", action="store_true", help="最後の1手は合法手の数で数える")
+    args = parser.parse_args()
+
+    game = parse_position(*args.position) if args.position else OthelloGame()
+    if args.check and args.position:
+        parser.error("--check は初期局面でのみ使えます")
+
+    if args.divide:
+        total = 0
+        for (row, col), nodes in divide(game, args.depth, args.bulk):
+            print(f"{'abcdefgh'[col]}{row + 1} {nodes}")
+            total += nodes
+        print(f"total {total}")
+        sys.exit(0)
+
+    print(f"{'depth':>5}{'nodes':>14}{'seconds':>10}{'nodes/s':>12}")
+    try:
+        for depth, nodes, seconds in run(game, args.depth, args.bulk,
+                                         REFERENCE_COUNTS if args.check else None):
+            rate = nodes / seconds if seconds else 0
+            print(f"{depth:>5}{nodes:>14}{seconds:>10.3f}{rate:>12.0f}")
+    except AssertionError as e:
+        print(f"NG {e}")
+        sys.exit(1)
+    if args.check:
+        print("OK")
@@ -0,0 +1,283 @@
+"""棋譜のバイナリ形式 (pygame非依存)
+
+自己対戦で大量の対局を保存するための、1手1バイトの棋譜ファイル。
+
+ファイルの形式 (整数はすべてリトルエンディアン)
+  ファイルヘッダ (8バイト): マジック b"OTGR", バージョン (uint16), 予約 (uint16)
+  対局ごとに
+    対局ヘッダ (8バイト): 手数 (uint16), フラグ (bit0: 終局している), 勝者 (0: 引き分け/未終局, 1: 黒, 2: 白),
+                          黒の種類, 白の種類 (0: 人, 1〜3: コンピュータの難易度), 黒の石数, 白の石数
+    手 (手数バイト): マス番号 (row * 8 + col), パスは PASS (64)
+
+対局 n の開始位置は、棋譜ファイルと同じ名前に .idx を付けたファイルの n 番目の uint64 に書く。
+読み込みはジェネレータで1局ずつ行い、ファイル全体をメモリに読み込むことはない。
+
+python othello_record.py info 棋譜ファイル
+python othello_record.py show 棋譜ファイル 対局番号
+python othello_record.py convert selfplay.jsonl 棋譜ファイル   (othello_selfplay の出力を変換する)
+python othello_record.py index 棋譜ファイル                      (.idx を作り直す)
+"""
+import os
+import struct
+from collections import namedtuple
+
+from othello_bitboard import BOARD_SIZE, SQUARE_COORDS, popcount
+
+MAGIC = b"OTGR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+GAME_HEADER = struct.Struct("<HBBBBBB")
+OFFSET = struct.Struct("<Q")
+
+# パスを表す手
+PASS = BOARD_SIZE * BOARD_SIZE
+# フラグ
+FINISHED = 1
+
+GameRecord = namedtuple("GameRecord", "moves finished winner black white black_discs white_discs")
+GameRecord.__doc__ = """1局の棋譜 (moves はマス番号の bytes, パスは PASS)"""
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def moves_from_game(game):
+    """初期局面から打った OthelloGame の手順をパスを含めたマス番号のリストにする"""
+    moves = []
+    expected = 1
+    for square, flips, mover, *_ in game.history:
+        if mover != expected:
+            # 相手がパスした
+            moves.append(PASS)
+        moves.append(square)
+        expected = 3 - mover
+    return moves
+
+
+def record_from_game(game, black=0, white=0):
+    """OthelloGame から GameRecord を作る (black, white は各側の種類: 0 が人, 1〜3 がコンピュータの難易度)"""
+    black_discs, white_discs = popcount(game.black), popcount(game.white)
+    winner = 0
+    if game.game_over:
+        winner = 1 if black_discs > white_discs else 2 if white_discs > black_discs else 0
+    return GameRecord(bytes(moves_from_game(game)), game.game_over, winner, black, white,
+                      black_discs, white_discs)
+
+
+def replay(moves, game=None):
+    """手順 (マス番号の列, PASS を含んでよい) を初期局面から打った OthelloGame を返す
+
+    不正な手があれば ValueError を送出する。
+    """
+    if game is None:
+        from othello_core import OthelloGame
+        game = OthelloGame()
+    for move in moves:
+        if move == PASS:
+            # パスは OthelloGame が自動で行う
+            continue
+        if game.game_over or not game.moves >> move & 1:
+            raise ValueError(f"不正な手です: {SQUARE_COORDS[move] if move < PASS else move}")
+        game.push_square(move)
+    return game
+
+
+class RecordWriter:
+    """棋譜ファイルに対局を1局ずつ追記する (.idx も同時に書く)
+
+    既存のファイルに追記するときは、前回の書き込みが途中で止まっていても続きから書けるように、
+    .idx を作り直して途中で切れた最後の対局を切り捨ててから書き始める。
+    """
+
+    def __init__(self, path, append=True):
+        self.path = path
+        # ファイルヘッダの途中で止まっていたファイルは最初から書き直す
+        exists = append and os.path.exists(path) and os.path.getsize(path) >= FILE_HEADER.size
+        if exists:
+            build_index(path)
+            with open(path, "r+b") as f:
+                f.truncate(_end_of_records(path))
+        self._file = open(path, "ab" if exists else "wb")
+        self._index = open(index_path(path), "ab" if exists else "wb")
+        if not exists:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self._offset = self._file.tell()
+
+    def write(self, record):
+        moves = bytes(record.moves)
+        self._index.write(OFFSET.pack(self._offset))
+        self._file.write(GAME_HEADER.pack(len(moves), FINISHED if record.finished else 0, record.winner,
+                                          record.black, record.white, record.black_discs, record.white_discs))
+        self._file.write(moves)
+        self._offset += GAME_HEADER.size + len(moves)
+
+    def write_game(self, game, black=0, white=0):
+        self.write(record_from_game(game, black, white))
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _read_header(f, path):
+    data = f.read(FILE_HEADER.size)
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"棋譜ファイルではありません: {path}")
+    magic, version, _ = FILE_HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"棋譜ファイルではありません: {path}")
+
+
+def _read_game(f):
+    # f の現在位置から1局読む。ファイルの終わりなら None
+    header = f.read(GAME_HEADER.size)
+    if len(header) < GAME_HEADER.size:
+        return None
+    count, flags, winner, black, white, black_discs, white_discs = GAME_HEADER.unpack(header)
+    moves = f.read(count)
+    if len(moves) < count:
+        return None
+    return GameRecord(moves, bool(flags & FINISHED), winner, black, white, black_discs, white_discs)
+
+
+def iter_records(path):
+    """棋譜ファイルの対局を先頭から1局ずつ返すジェネレータ (途中で切れた最後の対局は返さない)"""
+    with open(path, "rb") as f:
+        _read_header(f, path)
+        while True:
+            record = _read_game(f)
+            if record is None:
+                return
+            yield record
+
+
+def count_records(path):
+    """.idx から対局数を返す"""
+    return os.path.getsize(index_path(path)) // OFFSET.size
+
+
+def read_record(path, number):
+    """number 番目 (0から) の対局を .idx で位置を調べて読む"""
+    if number < 0:
+        raise IndexError(f"対局 {number} はありません")
+    with open(index_path(path), "rb") as index:
+        index.seek(number * OFFSET.size)
+        entry = index.read(OFFSET.size)
+    if len(entry) < OFFSET.size:
+        raise IndexError(f"対局 {number} はありません")
+    with open(path, "rb") as f:
+        _read_header(f, path)
+        f.seek(OFFSET.unpack(entry)[0])
+        record = _read_game(f)
+    if record is None:
+        raise IndexError(f"対局 {number} はありません")
+    return record
+
+
+def _end_of_records(path):
+    # 最後の完全な対局の終わりの位置 (.idx が正しいこと)
+    count = count_records(path)
+    if not count:
+        return FILE_HEADER.size
+    with open(index_path(path), "rb") as index:
+        index.seek((count - 1) * OFFSET.size)
+        offset = OFFSET.unpack(index.read(OFFSET.size))[0]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return offset + GAME_HEADER.size + GAME_HEADER.unpack(f.read(GAME_HEADER.size))[0]
+
+
+def build_index(path):
+    """棋譜ファイルを先頭から読んで .idx を作り直し、対局数を返す"""
+    count = 0
+    with open(path, "rb") as f, open(index_path(path), "wb") as index:
+        _read_header(f, path)
+        while True:
+            offset = f.tell()
+            if _read_game(f) is None:
+                break
+            index.write(OFFSET.pack(offset))
+            count += 1
+    return count
+
+
+def save_game(path, game, black=0, white=0):
+    """対局中の OthelloGame を1局だけの棋譜ファイルに保存する"""
+    with RecordWriter(path, append=False) as writer:
+        writer.write_game(game, black, white)
+
+
+def load_game(path, number=0):
+    """棋譜ファイルの対局を打ち直した OthelloGame と GameRecord を返す"""
+    record = read_record(path, number)
+    return replay(record.moves), record
+
+
+def record_from_selfplay(data):
+    """othello_selfplay の1局分の結果 (dict) から GameRecord を作る (打ち直さない)"""
+    moves = []
+    expected = 1
+    for player, row, col in data["moves"]:
+        if player != expected:
+            moves.append(PASS)
+        moves.append(row * BOARD_SIZE + col)
+        expected = 3 - player
+    return GameRecord(bytes(moves), True, data["winner"], data["black"], data["white"],
+                      data["black_discs"], data["white_discs"])
+
+
+def convert_selfplay(json_path, path):
+    """othello_selfplay の出力 (JSON Lines) を棋譜ファイルに追記し、変換した対局数を返す"""
+    import json
+
+    count = 0
+    with open(json_path, encoding="utf-8") as f, RecordWriter(path) as writer:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in data:
+                continue
+            writer.write(record_from_selfplay(data))
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "info":
+        games = moves = 0
+        results = [0, 0, 0]
+        for record in iter_records(sys.argv[2]):
+            games += 1
+            moves += len(record.moves)
+            results[record.winner] += 1
+        size = os.path.getsize(sys.argv[2])
+        print(f"{games} games, {moves} moves, {size} bytes ({size / games if games else 0:.1f} bytes/game)")
+        print(f"black {results[1]} / white {results[2]} / draw or unfinished {results[0]}")
+    elif command == "show":
+        record = read_record(sys.argv[2], int(sys.argv[3]))
+        print(" ".join("pass" if move == PASS else "abcdefgh"[move % BOARD_SIZE] + str(move // BOARD_SIZE + 1)
+                       for move in record.moves))
+        print(f"black {record.black_discs} - white {record.white_discs}"
+              f" ({'finished' if record.finished else 'unfinished'})")
+    elif command == "convert":
+        print(f"{convert_selfplay(sys.argv[2], sys.argv[3])} games")
+    elif command == "index":
+        print(f"{build_index(sys.argv[2])} games")
+    else:
+        print(__doc__)
@@ -0,0 +1,271 @@
+"""盤面の差分描画・文字列のキャッシュ・当たり判定・描画ループの待ち方 (GUI用)
+
+前回描いた盤面 (黒・白・合法手のマスク) と文字列を覚えておき、
+変わったマスと文字列の矩形だけを描き直す。描き直した矩形のリストを返すので、
+呼び出し側は pygame.display.update(rects) でその部分だけを画面に反映する。
+何も変わっていないフレームでは何も描かず、空のリストを返す。
+
+文字列は盤面と重なることがあるので、矩形ごとに
+背景 -> その矩形にかかるマス -> その矩形にかかる文字列 の順に描き直す。
+"""
+from collections import OrderedDict
+
+import pygame
+
+from othello_bitboard import BOARD_SIZE, FULL_MASK, iter_squares
+
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GREEN = (0, 128, 0)
+DARK_GREEN = (0, 100, 0)
+LIGHT_GREEN = (144, 238, 144)
+
+# 文字列キャッシュの既定の上限 (エントリ数)
+TEXT_CACHE_SIZE = 256
+# 当たり判定の格子の1辺 (ピクセル)
+GRID_CELL_SIZE = 64
+# アニメーション中のフレームレートの上限
+MAX_FPS = 60
+# 何も起きていないときにイベントを確かめる間隔 (ミリ秒)
+IDLE_POLL_MS = 50
+# 最後のイベントからこの時間 (ミリ秒) は毎フレームイベントを確かめる (マウス移動などに速く反応するため)
+ACTIVE_LINGER_MS = 500
+
+
+class SpatialGrid:
+    """矩形を格子に登録し、座標からその座標を含む物を引く (ボタンの当たり判定用)
+
+    登録した物が多くても、調べるのは座標と同じ格子に入っている物だけで済む。
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+
+    def clear(self):
+        self._cells.clear()
+
+    def insert(self, item, rect):
+        size = self.cell_size
+        for cell_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cell_x in range(rect.left // size, (rect.right - 1) // size + 1):
+                self._cells.setdefault((cell_x, cell_y), []).append((rect, item))
+
+    def query(self, pos):
+        """pos を含む物を返す (後から登録した物を優先する)。なければ None"""
+        x, y = pos
+        entries = self._cells.get((x // self.cell_size, y // self.cell_size))
+        if entries:
+            for rect, item in reversed(entries):
+                if rect.collidepoint(x, y):
+                    return item
+        return None
+
+
+class FrameScheduler:
+    """イベント駆動の描画ループの待ち方
+
+    wait(timeout) は次のフレームまで待ち、その間に届いたイベントのリストを返す。
+      timeout が 0    : アニメーション中。max_fps を上限にすぐ次のフレームへ進む
+      timeout が None : 入力などのイベントが届くまで眠る
+      それ以外        : イベントが届くか timeout ミリ秒経つまで眠る (タイマー)
+    イベントが続けて届いても max_fps より速くはフレームを進めない。
+
+    pygame.event.wait は内部で1ミリ秒ごとにイベントを確かめ続けるため、待っている間も
+    CPUを使う。そこで pygame.time.wait で眠り、起きるたびにイベントを確かめる。
+    確かめる間隔は、最後のイベントから ACTIVE_LINGER_MS の間は1フレーム、
+    それ以降は idle_poll_ms にする。
+    """
+
+    def __init__(self, max_fps=MAX_FPS, idle_poll_ms=IDLE_POLL_MS):
+        self.max_fps = max_fps
+        self.idle_poll_ms = idle_poll_ms
+        self.clock = pygame.time.Clock()
+        self._active_until = 0
+
+    def wait(self, timeout=None):
+        now = pygame.time.get_ticks()
+        deadline = None if timeout is None else now + timeout
+        frame_ms = 1000 // self.max_fps
+
+        events = pygame.event.get()
+        while not events and (deadline is None or now < deadline):
+            interval = frame_ms if now < self._active_until else self.idle_poll_ms
+            if deadline is not None:
+                interval = min(interval, deadline - now)
+            pygame.time.wait(max(1, interval))
+            events = pygame.event.get()
+            now = pygame.time.get_ticks()
+
+        if events:
+            self._active_until = now + ACTIVE_LINGER_MS
+        self.clock.tick(self.max_fps)
+        events.extend(pygame.event.get())
+        return events
+
+
+class TextCache:
+    """描画済みの文字列 Surface の LRU キャッシュ
+
+    キーは (text, font, color, antialias)。render(text, font, color, antialias) は
+    キャッシュにないときだけ呼ぶので、日本語の置き換えとラスタライズは文字列ごとに1回で済む。
+    max_entries を超えたら最も長く使われていないものから捨てる。
+    返した Surface は共有しているので、呼び出し側で書き換えないこと。
+    """
+
+    def __init__(self, render, max_entries=TEXT_CACHE_SIZE):
+        self._render = render
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+
+        # 統計
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font, color, antialias=True):
+        key = (text, font, color, antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self._render(text, font, color, antialias)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._surfaces),
+            "hit_rate": self.hit_rate(),
+        }
+
+
+class BoardRenderer:
+    """盤面と文字列を差分で描く
+
+    render_text(text, font, color) は文字列を描いた Surface を返す関数
+    (GUIごとの日本語の置き換えをここで行う)。
+    """
+
+    def __init__(self, surface, offset_x, offset_y, cell_size, render_text):
+        self.surface = surface
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.cell_size = cell_size
+        self.render_text = render_text
+        self.board_rect = pygame.Rect(offset_x, offset_y, BOARD_SIZE * cell_size, BOARD_SIZE * cell_size)
+
+        # 前回描いた内容 (None なら次のフレームで全体を描き直す)
+        self._masks = None
+        # [(text, font, color, pos, Surface, Rect)]
+        self._texts = []
+
+    def invalidate(self):
+        """次のフレームで画面全体を描き直す (別の画面から戻ったときなど)"""
+        self._masks = None
+
+    def cell_rect(self, square):
+        row, col = divmod(square, BOARD_SIZE)
+        return pygame.Rect(self.offset_x + col * self.cell_size, self.offset_y + row * self.cell_size,
+                           self.cell_size, self.cell_size)
+
+    def draw(self, game, texts):
+        """盤面と texts [(text, font, color, (x, y))] の変わった部分を描き、描いた矩形のリストを返す"""
+        masks = (game.black, game.white, game.moves)
+        full = self._masks is None
+        dirty = []
+
+        # 文字列は内容か位置が変わったものだけ描き直す (消えたものは前の矩形を背景で塗る)
+        old_texts = self._texts
+        new_texts = []
+        for index, (text, font, color, pos) in enumerate(texts):
+            old = old_texts[index] if index < len(old_texts) else None
+            if old is not None and old[:4] == (text, font, color, pos):
+                new_texts.append(old)
+                continue
+            image = self.render_text(text, font, color)
+            rect = image.get_rect(topleft=pos)
+            new_texts.append((text, font, color, pos, image, rect))
+            dirty.append(rect)
+            if old is not None:
+                dirty.append(old[5])
+        for old in old_texts[len(texts):]:
+            dirty.append(old[5])
+        self._texts = new_texts
+
+        if full:
+            dirty = [self.surface.get_rect()]
+        else:
+            # 石・合法手の表示が変わったマス
+            old_black, old_white, old_moves = self._masks
+            changed = (masks[0] ^ old_black) | (masks[1] ^ old_white) | (masks[2] ^ old_moves)
+            dirty.extend(self.cell_rect(square) for square in iter_squares(changed & FULL_MASK))
+        self._masks = masks
+
+        for rect in dirty:
+            self._repaint(rect, masks)
+        return dirty
+
+    def _repaint(self, rect, masks):
+        surface = self.surface
+        surface.set_clip(rect)
+        surface.fill(DARK_GREEN, rect)
+
+        # rect にかかるマス
+        area = rect.clip(self.board_rect)
+        if area.width and area.height:
+            cell = self.cell_size
+            first_col = (area.left - self.offset_x) // cell
+            last_col = (area.right - 1 - self.offset_x) // cell
+            first_row = (area.top - self.offset_y) // cell
+            last_row = (area.bottom - 1 - self.offset_y) // cell
+            for row in range(first_row, last_row + 1):
+                for col in range(first_col, last_col + 1):
+                    self._draw_cell(row * BOARD_SIZE + col, masks)
+
+        # rect にかかる文字列
+        for text in self._texts:
+            if text[5].colliderect(rect):
+                surface.blit(text[4], text[5])
+        surface.set_clip(None)
+
+    def _draw_cell(self, square, masks):
+        black, white, moves = masks
+        rect = self.cell_rect(square)
+        center = rect.center
+        surface = self.surface
+
+        # マス目 (枠線は fill で描く。draw.rect の枠線はクリップ後の矩形の縁に描かれてしまう)
+        surface.fill(GREEN, rect)
+        surface.fill(BLACK, (rect.left, rect.top, rect.width, 1))
+        surface.fill(BLACK, (rect.left, rect.bottom - 1, rect.width, 1))
+        surface.fill(BLACK, (rect.left, rect.top, 1, rect.height))
+        surface.fill(BLACK, (rect.right - 1, rect.top, 1, rect.height))
+
+        # 石
+        if black >> square & 1:
+            pygame.draw.circle(surface, BLACK, center, self.cell_size // 2 - 5)
+        elif white >> square & 1:
+            pygame.draw.circle(surface, WHITE, center, self.cell_size // 2 - 5)
+
+        # 有効な手の表示
+        if moves >> square & 1:
+            pygame.draw.circle(surface, LIGHT_GREEN, center, 10)
@@ -0,0 +1,326 @@
+"""αβ探索によるコンピュータの思考 (pygame非依存)
+
+ネガマックス形式のαβ探索を反復深化で深さ1から順に行い、
+時間切れになったらそれまでに見つかった最善手を返す。
+局面は OthelloGame の push/pop で進め戻しするので、探索中に盤面はコピーしない。
+
+探索のたびに統計 (ノード数・ノード数/秒・読んだ深さ・置換表のヒット率・実効分岐数・
+最善応手手順) を last_stats に dict で残す。profile を True にすると、
+着手と戻し・手の生成と並べ替え・評価・置換表にかかった時間の内訳も測る
+(関数呼び出しごとに時計を読むので、その分探索は遅くなる)。
+"""
+import time
+
+from othello_bitboard import BOARD_SIZE, SQUARE_COORDS, iter_squares, popcount
+from othello_endgame import EndgameSolver, SolveCancelled
+from othello_eval import WIN_SCORE, evaluate, final_score
+from othello_ordering import MoveOrderer, root_order
+from othello_tt import EXACT, LOWER, UPPER, TranspositionTable
+
+INFINITY = 1 << 30
+
+# 時間切れの確認間隔 (ノード数, 2のべき乗 - 1 でマスクする)
+TIME_CHECK_INTERVAL = 1023
+
+# profile で測る時間の内訳 (手の生成と並べ替え, 着手と戻し (次の手番の合法手マスクの計算を含む), 評価, 置換表)
+TIME_CATEGORIES = ("movegen", "make_unmake", "eval", "tt")
+
+
+class SearchTimeout(Exception):
+    """探索の時間切れ、または中断"""
+
+
+def _timed(function, times, category):
+    # function にかかった時間を times[category] に足していく関数を返す
+    perf_counter = time.perf_counter
+
+    def timed(*args):
+        start = perf_counter()
+        result = function(*args)
+        times[category] += perf_counter() - start
+        return result
+    return timed
+
+
+class SearchEngine:
+    """反復深化つきαβ探索
+
+    max_depth と time_limit (秒) のどちらか、または両方で探索量を制限する。
+    どちらも None の場合は終局まで読む。
+    空きマスが endgame_empties 以下の局面では終盤ソルバーで終局まで読み切る
+    (endgame_exact が True なら石差、False なら勝敗だけを確定させる)。
+    置換表 (tt_memory バイト, または tt に渡した置換表) と手の並べ替えの情報 (orderer) は
+    探索をまたいで使い回す。
+    search() に stop_event (threading.Event など) を渡すと、セットされた時点で時間切れと
+    同じように探索を打ち切る (別スレッドから中断するため)。
+    evaluator は末端の局面の評価関数 (game を受け取り手番側から見た評価値を返す)。
+    """
+
+    def __init__(self, max_depth=None, time_limit=None, tt_memory=16 * 1024 * 1024, orderer=None,
+                 endgame_empties=0, endgame_exact=True, evaluator=None, profile=False, tt=None):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.endgame_empties = endgame_empties
+        self.endgame_exact = endgame_exact
+        self.tt = TranspositionTable(tt_memory) if tt is None else tt
+        self.orderer = MoveOrderer() if orderer is None else orderer
+        self.evaluate = evaluate if evaluator is None else evaluator
+        self.profile = profile
+
+        # 直前の探索結果
+        self.nodes = 0
+        self.expanded = 0
+        self.best_score = 0
+        self.depth_reached = 0
+        self.last_stats = None
+
+        self._game = None
+        self._deadline = None
+        self._stop_event = None
+        self._iteration_best = None
+
+    def search(self, game, stop_event=None):
+        """game の手番側の最善手を (row, col) で返す。合法手がなければ None"""
+        if not game.moves:
+            return None
+
+        self._game = game
+        started = time.perf_counter()
+        self._deadline = None if self.time_limit is None else started + self.time_limit
+        self._stop_event = stop_event
+        self.nodes = 0
+        self.expanded = 0
+        self.depth_reached = 0
+        self.tt.new_search()
+        self.orderer.new_search()
+        tt_hits, tt_misses = self.tt.hits, self.tt.misses
+        times = dict.fromkeys(TIME_CATEGORIES, 0.0) if self.profile else None
+        patched = self._instrument(game, times) if self.profile else []
+        try:
+            empties = BOARD_SIZE * BOARD_SIZE - popcount(game.black | game.white)
+            if empties <= self.endgame_empties:
+                move, iterations, timed_out = self._solve_endgame(game, empties), [], False
+                source = "endgame"
+            else:
+                move, iterations, timed_out = self._iterate(game, empties)
+                source = "search"
+        finally:
+            for owner, name, original in patched:
+                if original is None:
+                    delattr(owner, name)
+                else:
+                    setattr(owner, name, original)
+            self._game = None
+            self._stop_event = None
+
+        seconds = time.perf_counter() - started
+        hits = self.tt.hits - tt_hits
+        probes = hits + self.tt.misses - tt_misses
+        self.last_stats = {
+            "source": source,
+            "move": list(move),
+            "score": self.best_score,
+            "depth": self.depth_reached,
+            "nodes": self.nodes,
+            "seconds": seconds,
+            "nps": self.nodes / seconds if seconds else 0.0,
+            "tt_hits": hits,
+            "tt_probes": probes,
+            "tt_hit_rate": hits / probes if probes else 0.0,
+            # 実効分岐数 (子を展開した局面1つあたりに読んだ子の数。βカットで読まずに済んだ手は含まない)
+            "branching_factor": self.nodes / self.expanded if self.expanded else None,
+            "iterations": iterations,
+            "timed_out": timed_out,
+            # 終盤ソルバーは置換表を使わないので、最善応手手順は最初の手だけになる
+            "pv": [list(square) for square in
+                   self.principal_variation(game, move, 1 if source == "endgame" else None)],
+            "times": None if times is None else dict(times, other=max(0.0, seconds - sum(times.values()))),
+        }
+        return move
+
+    def _iterate(self, game, empties):
+        # 反復深化。(最善手, 深さごとの記録, 時間切れになったか) を返す
+        base = len(game.history)
+        max_depth = empties if self.max_depth is None else min(self.max_depth, empties)
+
+        root_moves = root_order(iter_squares(game.moves))
+        best_move = root_moves[0]
+        self.best_score = 0
+        iterations = []
+        timed_out = False
+        started = time.perf_counter()
+
+        for depth in range(1, max(max_depth, 1) + 1):
+            self._iteration_best = None
+            nodes_before = self.nodes
+            try:
+                score, move = self._search_root(root_moves, depth)
+            except SearchTimeout:
+                # 探索途中の局面を元に戻す
+                while len(game.history) > base:
+                    game.pop()
+                # 前回の最善手を先頭に読んでいるので、読み終えた手の中の最善はそれ以上に良い手
+                if self._iteration_best is not None:
+                    best_move, self.best_score = self._iteration_best
+                timed_out = True
+                break
+
+            best_move = move
+            self.best_score = score
+            self.depth_reached = depth
+            iterations.append({"depth": depth, "nodes": self.nodes - nodes_before,
+                               "seconds": time.perf_counter() - started,
+                               "move": list(SQUARE_COORDS[move]), "score": score})
+            # 次の反復では今回の最善手から読む
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+
+        return SQUARE_COORDS[best_move], iterations, timed_out
+
+    def _instrument(self, game, times):
+        # 時間を測る関数に差し替える。(持ち主, 名前, 元の属性 (インスタンス属性でなければ None)) のリストを返す
+        patched = []
+        for owner, name, category in ((game, "push_square", "make_unmake"), (game, "pop", "make_unmake"),
+                                      (self.orderer, "order", "movegen"), (self, "evaluate", "eval"),
+                                      (self.tt, "probe", "tt"), (self.tt, "store", "tt")):
+            patched.append((owner, name, vars(owner).get(name)))
+            setattr(owner, name, _timed(getattr(owner, name), times, category))
+        return patched
+
+    def principal_variation(self, game, move, max_length=None):
+        """move から始まる最善応手手順を置換表の最善手をたどって [(row, col)] で返す"""
+        max_length = self.depth_reached if max_length is None else max_length
+        line = [move]
+        game.push(move)
+        while len(line) < max_length and not game.game_over:
+            entry = self.tt.probe(game.key)
+            if entry is None or entry[3] is None or not game.moves >> entry[3] & 1:
+                break
+            game.push_square(entry[3])
+            line.append(SQUARE_COORDS[entry[3]])
+        for _ in line:
+            game.pop()
+        return line
+
+    def _solve_endgame(self, game, empties):
+        solver = EndgameSolver(exact=self.endgame_exact)
+        try:
+            move, score = solver.solve(game, self._stop_event)
+        except SolveCancelled:
+            # 中断された結果は使われないので、どれか合法な手を返しておく
+            move, score = SQUARE_COORDS[root_order(iter_squares(game.moves))[0]], 0
+        self.nodes = solver.nodes
+        self.depth_reached = empties
+        # 終局時の評価値と同じ尺度にそろえる (勝敗モードでは石差の代わりに ±1)
+        if score > 0:
+            self.best_score = WIN_SCORE + score
+        elif score < 0:
+            self.best_score = -WIN_SCORE + score
+        else:
+            self.best_score = 0
+        return move
+
+    def _search_root(self, root_moves, depth):
+        game = self._game
+        mover = game.current_player
+        alpha = -INFINITY
+        best_move = None
+        self.expanded += 1
+
+        for square in root_moves:
+            score = self._score_move(game, mover, square, depth, alpha, INFINITY)
+            if score > alpha:
+                alpha = score
+                best_move = square
+                self._iteration_best = (square, score)
+
+        return alpha, best_move
+
+    def _score_move(self, game, mover, square, depth, alpha, beta):
+        # mover が square に打った局面を残り depth - 1 で読み、mover から見た評価値を返す
+        game.push_square(square)
+        # 相手がパスした場合は同じ側がもう一度打つので符号を反転しない
+        if game.current_player == mover:
+            score = self._negamax(depth - 1, 1, alpha, beta)
+        else:
+            score = -self._negamax(depth - 1, 1, -beta, -alpha)
+        game.pop()
+        return score
+
+    def search_move(self, game, square, depth, alpha=-INFINITY, beta=INFINITY, stop_event=None):
+        """game の手番側が square に打ったときの評価値を深さ depth・窓 (alpha, beta) で読む
+
+        評価値は打つ側から見た値で、窓の外なら上限または下限になる (fail-soft)。
+        nodes はこの呼び出しで読んだノード数になる。stop_event がセットされると
+        SearchTimeout を送出する (局面は元に戻す)。並列探索のワーカーが1手ずつ読むために使う。
+        """
+        base = len(game.history)
+        self._game = game
+        self._deadline = None
+        self._stop_event = stop_event
+        self.nodes = 0
+        try:
+            return self._score_move(game, game.current_player, square, depth, alpha, beta)
+        finally:
+            while len(game.history) > base:
+                game.pop()
+            self._game = None
+            self._stop_event = None
+
+    def _negamax(self, depth, ply, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & TIME_CHECK_INTERVAL:
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchTimeout()
+            if self._stop_event is not None and self._stop_event.is_set():
+                raise SearchTimeout()
+
+        game = self._game
+        if game.game_over:
+            return final_score(game)
+        if depth <= 0:
+            return self.evaluate(game)
+
+        tt = self.tt
+        entry = tt.probe(game.key)
+        hash_move = None
+        if entry is not None:
+            entry_depth, flag, score, hash_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        self.expanded += 1
+        alpha_orig = alpha
+        mover = game.current_player
+        best = -INFINITY
+        best_move = None
+        for square in self.orderer.order(game, game.moves, hash_move, ply, depth):
+            game.push_square(square)
+            if game.current_player == mover:
+                score = self._negamax(depth - 1, ply + 1, alpha, beta)
+            else:
+                score = -self._negamax(depth - 1, ply + 1, -beta, -alpha)
+            game.pop()
+
+            if score > best:
+                best = score
+                best_move = square
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.orderer.record_cutoff(mover, square, ply, depth)
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(game.key, depth, flag, best, best_move)
+        return best
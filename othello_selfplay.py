@@ -0,0 +1,211 @@
+"""コンピュータ同士の自己対戦 (pygame非依存)
+
+難易度ごとの強さを測るために、コンピュータ同士の対局をプロセスプールで並列に行い、
+終わった対局から順に1行1局の JSON (JSON Lines) でファイルに書き出す。
+
+- 各対局には対局番号から決まるシードを使うので、初級 (ランダム) の対局も再現できる
+- ワーカープロセスが落ちても、それまでに書き出した対局は失われない。
+  プールを作り直して終わっていない対局だけをやり直す
+- 出力ファイルに書き出し済みの対局は、再実行したときに飛ばす (--no-resume で最初から)
+- --records を指定すると、同じ対局を1手1バイトの棋譜ファイル (othello_record) にも書き出す
+
+例: 上級 (黒) と中級 (白) で200局、4プロセス
+    python othello_selfplay.py --games 200 --black 3 --white 2 --workers 4 --out selfplay.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from othello_core import OthelloGame
+from othello_record import RecordWriter, record_from_selfplay
+
+# プールが落ちたときに作り直す回数の上限
+MAX_RESTARTS = 5
+
+
+def game_seed(seed, index):
+    """対局番号ごとのシード"""
+    return seed * 1000003 + index
+
+
+def play_game(index, black, white, seed, search_time=0.1, search_depth=None):
+    """黒の難易度 black と白の難易度 white で1局打ち、結果を dict で返す"""
+    random.seed(seed)
+    moves = []
+    move_seconds = []
+    started = time.perf_counter()
+    # 対局が終わったら (並列探索なら) 探索エンジンのプロセスを終了する
+    with OthelloGame() as game:
+        game.game_mode = 1
+        game.search_time = search_time
+        game.search_depth = search_depth
+
+        while not game.game_over:
+            player = game.current_player
+            game.difficulty = black if player == 1 else white
+            move_started = time.perf_counter()
+            row, col = game.get_computer_move()
+            move_seconds.append(round(time.perf_counter() - move_started, 6))
+            game.make_move(row, col)
+            moves.append([player, row, col])
+
+    black_count, white_count = game.count_discs()
+    if black_count > white_count:
+        winner = 1
+    elif white_count > black_count:
+        winner = 2
+    else:
+        winner = 0
+    return {
+        "game": index,
+        "seed": seed,
+        "black": black,
+        "white": white,
+        "moves": moves,
+        "move_seconds": move_seconds,
+        "black_discs": black_count,
+        "white_discs": white_count,
+        "winner": winner,
+        "seconds": round(time.perf_counter() - started, 6),
+        "pid": os.getpid(),
+    }
+
+
+def load_completed(path):
+    """出力ファイルに書き出し済みの対局番号の集合を返す (途中で切れた最後の行は無視する)"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in record:
+                completed.add(record["game"])
+    return completed
+
+
+def run_selfplay(games, black, white, out_path, workers=None, seed=0, search_time=0.1,
+                 search_depth=None, resume=True, progress=None, records_path=None):
+    """games 局の自己対戦を行い、終わった対局から out_path に書き出す
+
+    書き出した対局数を返す。progress が指定されていれば1局終わるごとに
+    progress(終わった対局数, 全対局数) を呼ぶ。
+    records_path が指定されていれば、終局した対局を棋譜ファイルにも追記する。
+    """
+    completed = load_completed(out_path) if resume else set()
+    pending = set(range(games)) - completed
+    written = 0
+    restarts = 0
+    records = None if records_path is None else RecordWriter(records_path, append=resume)
+
+    def write(record):
+        out.write(json.dumps(record) + "\n")
+        if records is not None and "error" not in record:
+            records.write(record_from_selfplay(record))
+
+    try:
+        with open(out_path, "a" if resume else "w", encoding="utf-8") as out:
+            # 前回の実行が行の途中で止まっていたら改行を補う
+            if resume and out.tell() > 0:
+                with open(out_path, "rb") as check:
+                    check.seek(-1, os.SEEK_END)
+                    if check.read(1) != b"\n":
+                        out.write("\n")
+
+            while pending:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {pool.submit(play_game, index, black, white, game_seed(seed, index),
+                                           search_time, search_depth): index
+                               for index in sorted(pending)}
+                    try:
+                        for future in as_completed(futures):
+                            index = futures[future]
+                            try:
+                                record = future.result()
+                            except BrokenProcessPool:
+                                raise
+                            except Exception as e:
+                                # 対局中の例外は記録して、その対局はやり直さない
+                                record = {"game": index, "error": repr(e)}
+                            write(record)
+                            out.flush()
+                            if records is not None:
+                                records.flush()
+                            pending.discard(index)
+                            written += 1
+                            if progress is not None:
+                                progress(games - len(pending), games)
+                    except BrokenProcessPool:
+                        # ワーカーが落ちた。終わっている対局を書き出してからプールを作り直す
+                        for future, index in futures.items():
+                            if index in pending and future.done() and future.exception() is None:
+                                write(future.result())
+                                pending.discard(index)
+                                written += 1
+                        out.flush()
+                        if records is not None:
+                            records.flush()
+                        restarts += 1
+                        if restarts > MAX_RESTARTS:
+                            raise
+    finally:
+        if records is not None:
+            records.close()
+    return written
+
+
+def summarize(path):
+    """出力ファイルの勝敗を集計する"""
+    summary = {"games": 0, "black_wins": 0, "white_wins": 0, "draws": 0, "errors": 0,
+               "moves": 0, "move_seconds": 0.0}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in record:
+                summary["errors"] += 1
+                continue
+            summary["games"] += 1
+            summary[("draws", "black_wins", "white_wins")[record["winner"]]] += 1
+            summary["moves"] += len(record["moves"])
+            summary["move_seconds"] += sum(record["move_seconds"])
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="コンピュータ同士の自己対戦")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--black", type=int, default=3, choices=(1, 2, 3), help="黒の難易度")
+    parser.add_argument("--white", type=int, default=3, choices=(1, 2, 3), help="白の難易度")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数 (既定: CPU数)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search-time", type=float, default=0.1, help="上級の1手あたりの時間 (秒)")
+    parser.add_argument("--depth", type=int, default=None, help="上級の探索の深さ")
+    parser.add_argument("--out", default="selfplay.jsonl")
+    parser.add_argument("--no-resume", action="store_true", help="出力ファイルを上書きして最初からやり直す")
+    parser.add_argument("--records", default=None, help="対局を書き出す棋譜ファイル (othello_record の形式)")
+    args = parser.parse_args()
+
+    def report(done, total):
+        print(f"\r{done}/{total}", end="", flush=True)
+
+    start = time.perf_counter()
+    count = run_selfplay(args.games, args.black, args.white, args.out, args.workers, args.seed,
+                         args.search_time, args.depth, not args.no_resume, report, args.records)
+    elapsed = time.perf_counter() - start
+    print(f"\n{count} games in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.2f} games/s)")
+
+    result = summarize(args.out)
+    print(f"black {result['black_wins']} / white {result['white_wins']} / draw {result['draws']}"
+          f" ({result['games']} games, {result['errors']} errors)")
+    if result["moves"]:
+        print(f"{result['move_seconds'] / result['moves'] * 1000:.2f} ms per move")
@@ -0,0 +1,299 @@
+"""パターン評価の重みの学習 (NumPy, pygame非依存)
+
+othello_pattern の表を、対局の最終石差から学習する。
+棋譜 (othello_record) を1局ずつ読んで局面を作るジェネレータから、一定の大きさの
+シャッフル用バッファとミニバッチだけをメモリに置くので、棋譜ファイルの大きさによらず学習できる。
+
+- 局面ごとのパターンの番号は、ミニバッチの局面を (N, 64) のマスの配列にして行列積1回で求める
+- 8通りの対称変換した局面も同じ目標値で学習する (対称な局面の評価値が揃う)
+- 合法手の数・潜在的な合法手の数・開放度の差 (othello_pattern.SCALAR_FEATURES) も配列演算で求めて一緒に学習する
+- 段階 (othello_pattern.PHASE_DISCS) ごとに、目標値 (黒から見た最終石差) との二乗誤差を L2 正則化つきの
+  ミニバッチ SGD で小さくする。各重みの更新量は、そのバッチで重みが使われた回数で割って揃える
+- 対局番号が VALIDATION_EVERY の倍数の対局は学習に使わず、誤差の確認に使う
+- 学習した重みは石差を SCALE 倍した整数で重みファイル (othello_pattern.write_weights) に書く
+
+python othello_train.py selfplay 棋譜ファイル [局数]           学習用の対局を作る (追記する)
+python othello_train.py fit 棋譜ファイル 重みファイル [エポック数]   重みを学習する
+python othello_train.py match 重みファイル [局数] [深さ]        学習した重みと規則の表を対局させる
+"""
+import random
+import time
+
+import numpy as np
+
+from othello_book import to_canonical_square
+from othello_batch import legal_moves, neighbours
+from othello_pattern import (INSTANCES, PATTERN_LENGTHS, PATTERN_NAMES, PHASE_COUNT, PHASE_OF_DISCS,
+                             SCALAR_FEATURES, SQUARES, PatternEvaluator)
+from othello_record import PASS, count_records, iter_records, record_from_game
+
+# 評価値 = 石差 * SCALE
+SCALE = 16
+# 対局番号がこの数の倍数の対局を検証用にする
+VALIDATION_EVERY = 10
+
+# (マス番号, 置き場所) に3のべき乗を入れた行列。(N, 64) のマスの配列に掛けるとパターンの番号になる
+INDEX_MATRIX = np.zeros((SQUARES, len(INSTANCES)), dtype=np.float32)
+for _index, (_, _squares) in enumerate(INSTANCES):
+    for _position, _square in enumerate(_squares):
+        INDEX_MATRIX[_square, _index] = 3 ** _position
+# 対称変換した局面のパターンの番号を1回の行列積で求めるために、変換ごとに行を並べ替えて横につなげた行列
+# (番号は float32 で正確に表せる大きさなので、整数の行列積より速い BLAS の行列積を使う)
+SYMMETRY_MATRIX = np.concatenate(
+    [INDEX_MATRIX[[to_canonical_square(square, symmetry) for square in range(SQUARES)]] for symmetry in range(8)],
+    axis=1)
+# パターンの名前ごとの置き場所の番号
+INSTANCE_COLUMNS = {name: [index for index, (instance, _) in enumerate(INSTANCES) if instance == name]
+                    for name in PATTERN_NAMES}
+_PHASE_OF_DISCS = np.array(PHASE_OF_DISCS)
+
+
+def selfplay_records(games, depth=2, random_moves=10, epsilon=0.0, endgame_empties=10, seed=0,
+                     evaluator=None):
+    """学習用の対局を1局ずつ打って GameRecord を返すジェネレータ
+
+    最初の random_moves 手と、以後も epsilon の確率で無作為に打ち、局面を散らす。
+    それ以外は深さ depth の探索で打ち、空きマスが endgame_empties 以下になったら読み切る
+    (終盤を読み切るので、最終石差が学習の目標値として使える)。
+    """
+    from othello_core import OthelloGame
+    from othello_search import SearchEngine
+
+    rng = random.Random(seed)
+    engine = SearchEngine(max_depth=depth, endgame_empties=endgame_empties, tt_memory=1024 * 1024,
+                          evaluator=PatternEvaluator() if evaluator is None else evaluator)
+    for _ in range(games):
+        game = OthelloGame()
+        while not game.game_over:
+            if len(game.history) < random_moves or rng.random() < epsilon:
+                game.make_move(*rng.choice(game.valid_moves))
+            else:
+                game.make_move(*engine.search(game))
+        yield record_from_game(game, 3, 3)
+
+
+def iter_positions(records):
+    """GameRecord の列から (黒, 白, 黒から見た最終石差) を1局面ずつ返すジェネレータ
+
+    終局した対局だけを使い、終局の局面は含めない。
+    """
+    from othello_core import OthelloGame
+
+    for record in records:
+        if not record.finished:
+            continue
+        target = record.black_discs - record.white_discs
+        game = OthelloGame()
+        for move in record.moves:
+            if move == PASS:
+                continue
+            yield game.black, game.white, target
+            game.push_square(move)
+
+
+def split_records(records, validation):
+    """対局番号が VALIDATION_EVERY の倍数の対局 (validation=True) か、それ以外の対局だけを返す"""
+    for number, record in enumerate(records):
+        if (number % VALIDATION_EVERY == 0) == validation:
+            yield record
+
+
+def shuffled(items, buffer_size, rng):
+    """items を buffer_size 個のバッファの中で混ぜて返すジェネレータ (同じ対局の局面が続かないようにする)"""
+    buffer = []
+    for item in items:
+        if len(buffer) < buffer_size:
+            buffer.append(item)
+            continue
+        index = rng.randrange(buffer_size)
+        yield buffer[index]
+        buffer[index] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def iter_batches(positions, batch_size):
+    """局面の列を batch_size 個ずつの (黒 (N,) uint64, 白 (N,) uint64, 目標値 (N,) float) にする"""
+    batch = []
+    for position in positions:
+        batch.append(position)
+        if len(batch) == batch_size:
+            yield _to_arrays(batch)
+            batch = []
+    if batch:
+        yield _to_arrays(batch)
+
+
+def _to_arrays(batch):
+    black, white, targets = zip(*batch)
+    return np.array(black, dtype=np.uint64), np.array(white, dtype=np.uint64), np.array(targets, dtype=float)
+
+
+def _unpack(masks):
+    # (N,) の uint64 -> (N, 64) の bool 配列 (マス番号 = ビット番号)
+    bits = np.unpackbits(np.ascontiguousarray(masks, dtype="<u8").view(np.uint8), bitorder="little")
+    return bits.reshape(len(masks), SQUARES).view(bool)
+
+
+def _popcount(masks):
+    return np.count_nonzero(_unpack(masks), axis=1)
+
+
+def batch_features(black, white, symmetries=1):
+    """局面の配列から、パターンの番号 (N * symmetries, 置き場所の数)、段階 (N * symmetries,)、
+    SCALAR_FEATURES の値 (N * symmetries, 4) を返す
+
+    symmetries が 8 なら、対称変換した局面を変換ごとに続けて並べる (SCALAR_FEATURES の値は変換しても同じ)。
+    合法手の数などは othello_eval.mobility_features と同じ値を配列演算で求める。
+    """
+    black_cells = _unpack(black)
+    white_cells = _unpack(white)
+    cells = black_cells.astype(np.float32) + 2 * white_cells
+    black_discs = np.count_nonzero(black_cells, axis=1)
+    white_discs = np.count_nonzero(white_cells, axis=1)
+    # (N, 変換 * 置き場所) -> (変換 * N, 置き場所)
+    indices = (cells @ SYMMETRY_MATRIX[:, :symmetries * len(INSTANCES)]).astype(np.int32)
+    indices = indices.reshape(len(cells), symmetries, -1).transpose(1, 0, 2).reshape(-1, len(INSTANCES))
+    phases = _PHASE_OF_DISCS[black_discs + white_discs]
+
+    discs = black | white
+    empty = ~discs
+    frontier = discs & neighbours(empty)
+    scalars = np.stack([
+        black_discs - white_discs,
+        _popcount(legal_moves(np.stack([black, white], axis=1)))
+        - _popcount(legal_moves(np.stack([white, black], axis=1))),
+        _popcount(empty & neighbours(white)) - _popcount(empty & neighbours(black)),
+        _popcount(frontier & black) - _popcount(frontier & white),
+    ], axis=1).astype(float)
+    return indices, np.tile(phases, symmetries), np.tile(scalars, (symmetries, 1))
+
+
+class PatternModel:
+    """段階ごとのパターンの表と SCALAR_FEATURES の重み (石差の単位の float)
+
+    scalars は学習する SCALAR_FEATURES の名前 (ほかの重みは0のまま)。
+    """
+
+    def __init__(self, scalars=SCALAR_FEATURES):
+        self.tables = [{name: np.zeros(3 ** length) for name, length in zip(PATTERN_NAMES, PATTERN_LENGTHS)}
+                       for _ in range(PHASE_COUNT)]
+        self.scalars = np.zeros((PHASE_COUNT, len(SCALAR_FEATURES)))
+        self._scalar_mask = np.array([name in scalars for name in SCALAR_FEATURES])
+
+    def predict(self, indices, phases, scalars):
+        """batch_features の結果から黒から見た予測値を返す"""
+        scores = (self.scalars[phases] * scalars).sum(axis=1)
+        for phase in range(PHASE_COUNT):
+            rows = phases == phase
+            if not rows.any():
+                continue
+            for name, columns in INSTANCE_COLUMNS.items():
+                scores[rows] += self.tables[phase][name][indices[rows][:, columns]].sum(axis=1)
+        return scores
+
+    def update(self, indices, phases, scalars, targets, rate, regularization):
+        """1つのミニバッチで重みを更新し、更新前の誤差の二乗和を返す"""
+        errors = targets - self.predict(indices, phases, scalars)
+        for phase in range(PHASE_COUNT):
+            rows = phases == phase
+            if not rows.any():
+                continue
+            phase_errors = errors[rows]
+            phase_indices = indices[rows]
+            for name, columns in INSTANCE_COLUMNS.items():
+                table = self.tables[phase][name]
+                used = phase_indices[:, columns].ravel()
+                gradient = np.bincount(used, np.repeat(phase_errors, len(columns)), len(table))
+                counts = np.bincount(used, minlength=len(table))
+                touched = counts > 0
+                table[touched] += rate * (gradient[touched] / counts[touched] - regularization * table[touched])
+            # 値ごとに、その値の二乗和で割って更新量を揃える
+            phase_scalars = scalars[rows]
+            step = (phase_errors @ phase_scalars) / ((phase_scalars * phase_scalars).sum(axis=0) + 1)
+            self.scalars[phase] += rate * step * self._scalar_mask
+        return float(errors @ errors)
+
+    def weights(self, scale=SCALE):
+        """othello_pattern.write_weights に渡す形の重み (評価値の単位)"""
+        return [dict({name: table * scale for name, table in tables.items()},
+                     **{name: value * scale for name, value in zip(SCALAR_FEATURES, scalars)})
+                for tables, scalars in zip(self.tables, self.scalars)]
+
+
+def validate(model, path, batch_size=8192):
+    """検証用の対局の局面について、石差の単位の RMSE を返す"""
+    squared = count = 0
+    for black, white, targets in iter_batches(iter_positions(split_records(iter_records(path), True)),
+                                              batch_size):
+        errors = targets - model.predict(*batch_features(black, white))
+        squared += float(errors @ errors)
+        count += len(targets)
+    return (squared / count) ** 0.5 if count else float("nan")
+
+
+def train(path, epochs=3, batch_size=4096, rate=0.01, regularization=0.03, buffer_size=100000,
+          symmetries=8, seed=0, report=None, scalars=SCALAR_FEATURES):
+    """棋譜ファイルの学習用の対局から PatternModel を学習して返す (scalars は学習する SCALAR_FEATURES)
+
+    エポックごとに棋譜ファイルを先頭から読み直す。report があれば、エポックごとに
+    report(エポック, 局面数, 秒, 学習の RMSE, 検証の RMSE) を呼ぶ。
+    """
+    rng = random.Random(seed)
+    model = PatternModel(scalars)
+    for epoch in range(epochs):
+        started = time.perf_counter()
+        squared = positions = 0
+        records = split_records(iter_records(path), False)
+        for black, white, targets in iter_batches(shuffled(iter_positions(records), buffer_size, rng),
+                                                  batch_size):
+            features = batch_features(black, white, symmetries)
+            squared += model.update(*features, np.tile(targets, symmetries), rate, regularization)
+            positions += len(targets)
+        seconds = time.perf_counter() - started
+        if report is not None:
+            train_rmse = (squared / (positions * symmetries)) ** 0.5 if positions else float("nan")
+            report(epoch, positions, seconds, train_rmse, validate(model, path))
+    return model
+
+
+if __name__ == "__main__":
+    import sys
+
+    from othello_pattern import default_weights, play_match, write_weights
+    from othello_record import RecordWriter
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "selfplay":
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+        start = time.perf_counter()
+        with RecordWriter(sys.argv[2]) as writer:
+            # 追記するときは、すでにある対局数をシードにして別の対局にする
+            for number, record in enumerate(selfplay_records(count, seed=count_records(sys.argv[2])), 1):
+                writer.write(record)
+                if number % 100 == 0:
+                    writer.flush()
+                    print(f"\r{number}/{count}", end="", flush=True)
+        print(f"\n{count} games in {time.perf_counter() - start:.0f}s")
+    elif command == "fit":
+        epochs = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+
+        def report(epoch, positions, seconds, train_rmse, validation_rmse):
+            print(f"epoch {epoch + 1}: {positions} positions, {positions / seconds:.0f} positions/s,"
+                  f" rmse {train_rmse:.2f} (validation {validation_rmse:.2f}) discs")
+
+        model = train(sys.argv[2], epochs, report=report)
+        size = write_weights(sys.argv[3], model.weights())
+        print(f"{size} bytes -> {sys.argv[3]}")
+    elif command == "match":
+        from othello_eval import evaluate as evaluate_squares
+
+        games = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+        depth = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+        trained = PatternEvaluator(sys.argv[2])
+        for name, opponent in (("rules", PatternEvaluator(default_weights())), ("squares", evaluate_squares)):
+            wins, losses, draws, margin = play_match(trained, opponent, games, depth)
+            print(f"trained vs {name} (depth {depth}): {wins} wins, {losses} losses, {draws} draws,"
+                  f" disc margin {margin / games:+.1f} per game")
+    else:
+        print(__doc__)
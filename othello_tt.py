@@ -0,0 +1,285 @@
+"""Zobristハッシュと置換表 (pygame非依存)
+
+局面のハッシュ値は OthelloGame が着手のたびに差分で更新する。
+置換表は固定サイズで、メモリ上限を超えて大きくなることはない。
+SharedTranspositionTable は同じ置換表を共有メモリに置き、複数のプロセスから読み書きする。
+"""
+import random
+from array import array
+
+from othello_bitboard import BOARD_SIZE, START_BLACK, START_WHITE, iter_squares
+
+# Zobristキー (再現性のため固定シードで生成する)
+_rng = random.Random(20240601)
+ZOBRIST_BLACK = [_rng.getrandbits(64) for _ in range(BOARD_SIZE * BOARD_SIZE)]
+ZOBRIST_WHITE = [_rng.getrandbits(64) for _ in range(BOARD_SIZE * BOARD_SIZE)]
+# 石が裏返ったときは黒と白のキーを両方 XOR する
+ZOBRIST_FLIP = [b ^ w for b, w in zip(ZOBRIST_BLACK, ZOBRIST_WHITE)]
+# 白の手番のときに XOR する
+ZOBRIST_WHITE_TO_MOVE = _rng.getrandbits(64)
+del _rng
+
+
+def zobrist_key(black, white, current_player):
+    """局面のZobristキーを最初から計算する"""
+    key = 0
+    for square in iter_squares(black):
+        key ^= ZOBRIST_BLACK[square]
+    for square in iter_squares(white):
+        key ^= ZOBRIST_WHITE[square]
+    if current_player == 2:
+        key ^= ZOBRIST_WHITE_TO_MOVE
+    return key
+
+
+START_KEY = zobrist_key(START_BLACK, START_WHITE, 1)
+
+# 評価値の種類
+EXACT = 0
+LOWER = 1  # 真の値は score 以上 (βカット)
+UPPER = 2  # 真の値は score 以下 (全ての手が α 以下)
+
+NO_MOVE = 64
+
+# data の詰め方: score(32) | depth(8) | flag(2) | move(7) | generation(8)
+_SCORE_OFFSET = 1 << 31
+_DEPTH_SHIFT = 32
+_FLAG_SHIFT = 40
+_MOVE_SHIFT = 42
+_GENERATION_SHIFT = 49
+
+# 1エントリあたりのバイト数 (キー8バイト + データ8バイト)
+ENTRY_SIZE = 16
+
+# 共有する置換表でデータの上位7ビットに入れる、書いたプロセスの番号
+_WRITER_SHIFT = 57
+MAX_WRITERS = 1 << (64 - _WRITER_SHIFT)
+# 共有メモリの先頭の語 (世代, バケット数)
+_HEADER_WORDS = 2
+
+
+def bucket_count(memory_bytes):
+    """memory_bytes に収まる最大の2のべき乗のバケット数 (1バケット = 2エントリ)"""
+    buckets = 1
+    while buckets * 4 * ENTRY_SIZE <= memory_bytes:
+        buckets *= 2
+    return buckets
+
+
+def pack_entry(depth, flag, score, move, generation):
+    return ((score + _SCORE_OFFSET)
+            | depth << _DEPTH_SHIFT
+            | flag << _FLAG_SHIFT
+            | move << _MOVE_SHIFT
+            | generation << _GENERATION_SHIFT)
+
+
+def unpack_entry(data):
+    """data を (depth, flag, score, move) に戻す。move がない場合は None"""
+    move = data >> _MOVE_SHIFT & 0x7F
+    return (data >> _DEPTH_SHIFT & 0xFF,
+            data >> _FLAG_SHIFT & 0x3,
+            (data & 0xFFFFFFFF) - _SCORE_OFFSET,
+            None if move == NO_MOVE else move)
+
+
+class TranspositionTable:
+    """固定サイズの置換表
+
+    2エントリで1バケットとし、1つ目は深さ優先 (深い結果か、前回以前の探索の
+    結果なら置き換える)、2つ目は常に置き換える。
+    memory_bytes を超えない最大の2のべき乗個のバケットを確保する。
+    """
+
+    def __init__(self, memory_bytes=16 * 1024 * 1024):
+        buckets = bucket_count(memory_bytes)
+        self.bucket_count = buckets
+        self.memory_bytes = buckets * 2 * ENTRY_SIZE
+        self._mask = buckets - 1
+        self._keys = array("Q", [0]) * (buckets * 2)
+        self._data = array("Q", [0]) * (buckets * 2)
+        self.generation = 0
+
+        # 統計
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        """探索ごとに呼ぶ。古い探索の深いエントリを置き換えられるようにする"""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        self._keys = array("Q", [0]) * len(self._keys)
+        self._data = array("Q", [0]) * len(self._data)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """key のエントリを (depth, flag, score, move) で返す。なければ None"""
+        index = (key & self._mask) << 1
+        keys = self._keys
+        if keys[index] == key:
+            self.hits += 1
+            return unpack_entry(self._data[index])
+        if keys[index + 1] == key:
+            self.hits += 1
+            return unpack_entry(self._data[index + 1])
+        self.misses += 1
+        # 別の局面が同じバケットを使っている
+        if keys[index] or keys[index + 1]:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = (key & self._mask) << 1
+        keys = self._keys
+        data = self._data
+        if move is None:
+            move = NO_MOVE
+        entry = pack_entry(depth, flag, score, move, self.generation)
+        self.stores += 1
+
+        # 深さ優先のスロット
+        stored = data[index]
+        if (keys[index] == key or not keys[index]
+                or stored >> _GENERATION_SHIFT & 0xFF != self.generation
+                or depth >= stored >> _DEPTH_SHIFT & 0xFF):
+            keys[index] = key
+            data[index] = entry
+            return
+
+        # 常に置き換えるスロット
+        keys[index + 1] = key
+        data[index + 1] = entry
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "hit_rate": self.hit_rate(),
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """共有メモリ (multiprocessing.shared_memory) に置いた、複数のプロセスで共有する置換表
+
+    name を指定しなければ共有メモリを確保し (このプロセスが持ち主になる)、他のプロセスは
+    その name を指定して開く。バケットの作り方と置き換え方は TranspositionTable と同じ。
+    エントリは (キー ^ データ, データ) の2語で、ロックは使わない。2つのプロセスが同じエントリを
+    同時に書いて2語が別々の書き込みのものになっても、キーが一致しなくなって読まれないだけになる。
+    データの上位7ビットには書いたプロセスの番号 (writer, 持ち主は0) を入れ、
+    他のプロセスが書いたエントリにヒットした回数を shared_hits に数える。
+    世代 (new_search) と clear() は持ち主だけが変え、他のプロセスでは統計を消して世代を読み直すだけ。
+    持ち主が close() すると共有メモリを解放する。
+    """
+
+    def __init__(self, memory_bytes=16 * 1024 * 1024, name=None, writer=0):
+        if not 0 <= writer < MAX_WRITERS:
+            raise ValueError(f"writer は0から{MAX_WRITERS - 1}までです: {writer}")
+        # othello_core から読み込まれるモジュールなので、共有メモリを使うときだけ import する
+        from multiprocessing import shared_memory
+
+        self.owner = name is None
+        if self.owner:
+            buckets = bucket_count(memory_bytes)
+            self._shm = shared_memory.SharedMemory(create=True, size=(_HEADER_WORDS + buckets * 4) * 8)
+            self._words = self._shm.buf.cast("Q")
+            self._words[1] = buckets
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._words = self._shm.buf.cast("Q")
+            buckets = self._words[1]
+        self.name = self._shm.name
+        self.writer = writer
+        self.bucket_count = buckets
+        self.memory_bytes = buckets * 2 * ENTRY_SIZE
+        self._mask = buckets - 1
+        self.generation = self._words[0]
+        self.reset_stats()
+
+    def new_search(self):
+        """探索ごとに呼ぶ。持ち主は世代を進め、他のプロセスは共有メモリの世代を読む"""
+        if self.owner:
+            self._words[0] = (self._words[0] + 1) & 0xFF
+        self.generation = self._words[0]
+
+    def clear(self):
+        """持ち主なら全エントリを消す (他のプロセスが読み書きしていないときに呼ぶ)"""
+        if self.owner:
+            self._shm.buf[_HEADER_WORDS * 8:] = bytes(len(self._shm.buf) - _HEADER_WORDS * 8)
+        self.reset_stats()
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.shared_hits = 0
+
+    def probe(self, key):
+        index = _HEADER_WORDS + ((key & self._mask) << 2)
+        words = self._words
+        for slot in (index, index + 2):
+            data = words[slot + 1]
+            if data and words[slot] ^ data == key:
+                self.hits += 1
+                if data >> _WRITER_SHIFT != self.writer:
+                    self.shared_hits += 1
+                return unpack_entry(data)
+        self.misses += 1
+        if words[index + 1] or words[index + 3]:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = _HEADER_WORDS + ((key & self._mask) << 2)
+        words = self._words
+        if move is None:
+            move = NO_MOVE
+        entry = pack_entry(depth, flag, score, move, self.generation) | self.writer << _WRITER_SHIFT
+        self.stores += 1
+
+        # 深さ優先のスロット (データを先に書く。途中で読まれてもキーが一致しない)
+        stored = words[index + 1]
+        if (not stored or words[index] ^ stored == key
+                or stored >> _GENERATION_SHIFT & 0xFF != self.generation
+                or depth >= stored >> _DEPTH_SHIFT & 0xFF):
+            words[index + 1] = entry
+            words[index] = key ^ entry
+            return
+
+        # 常に置き換えるスロット
+        words[index + 3] = entry
+        words[index + 2] = key ^ entry
+
+    def stats(self):
+        stats = super().stats()
+        stats["shared_hits"] = self.shared_hits
+        return stats
+
+    def close(self):
+        """共有メモリを閉じる (持ち主なら解放する)"""
+        if self._shm is None:
+            return
+        self._words.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
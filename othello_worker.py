@@ -0,0 +1,90 @@
+"""コンピュータの手をバックグラウンドで計算する (pygame非依存)
+
+GUIの描画ループを止めないように、コンピュータの手は別スレッドで計算する。
+描画ループは poll() を呼び、手が返ってきたら盤面に反映する。
+その手を決めたときの統計 (OthelloGame.last_stats) は last_stats で読める。
+計算が終わったときに on_done を呼ぶので、眠っている描画ループを起こすのに使える。
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+
+# 計算中のスレッド切り替え間隔 (秒)。既定の5msだと描画スレッドがGILを待つ間に
+# フレームが遅れるので短くする
+SWITCH_INTERVAL = 0.001
+
+
+class ComputerWorker:
+    """コンピュータの手を1つずつ別スレッドで計算する
+
+    計算は局面の複製に対して行うので、計算中も元の game を描画に使える。
+    min_time (秒) より早く計算が終わっても、その時間が経つまでは手を返さない
+    (コンピュータが一瞬で打ち返さないようにするため)。
+    on_done は手を返せるようになったときに計算スレッドから呼ばれる (引数なし)。
+    作成してから shutdown() するまでは、スレッド切り替え間隔を SWITCH_INTERVAL にする。
+    """
+
+    def __init__(self, min_time=0.5, on_done=None):
+        self.min_time = min_time
+        self.on_done = on_done
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(SWITCH_INTERVAL)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="othello-ai")
+        self._future = None
+        self._stop_event = None
+        # 最後に poll() で返した手の統計
+        self.last_stats = None
+
+    @property
+    def busy(self):
+        """計算中 (または結果を受け取っていない) かどうか"""
+        return self._future is not None
+
+    def start(self, game):
+        """game の手番側の手の計算を始める。計算中のものがあれば中断する"""
+        self.cancel()
+        if game.difficulty == 3:
+            # 複製が置換表を共有するように、元の game に探索エンジンを作っておく
+            game.get_search_engine()
+        self._stop_event = threading.Event()
+        self._future = self._executor.submit(self._run, game.copy(), self._stop_event,
+                                             time.perf_counter() + self.min_time)
+        if self.on_done is not None:
+            self._future.add_done_callback(lambda future: self.on_done())
+
+    @staticmethod
+    def _run(game, stop_event, ready_at):
+        move = game.get_computer_move(stop_event)
+        # 最低待ち時間が過ぎるまで待つ (中断されたらすぐに戻る)
+        stop_event.wait(max(0.0, ready_at - time.perf_counter()))
+        return move, game.last_stats
+
+    def poll(self):
+        """計算が終わっていれば手 (row, col) を返す。まだなら None"""
+        future = self._future
+        if future is None or not future.done():
+            return None
+        self._future = None
+        self._stop_event = None
+        move, self.last_stats = future.result()
+        return move
+
+    def cancel(self, wait=False):
+        """計算を中断して結果を捨てる
+
+        wait が真なら計算スレッドが止まるまで待つ (局面の探索エンジンを close() する前に使う)。
+        """
+        future = self._future
+        if future is not None:
+            self._stop_event.set()
+            future.cancel()
+            self._future = None
+            self._stop_event = None
+            if wait:
+                futures_wait([future])
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
+        sys.setswitchinterval(self._switch_interval)